@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Dict
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv, find_dotenv
@@ -22,15 +23,131 @@ class Settings(BaseModel):
             os.path.join(os.path.dirname(__file__), "..", "static")
         ),
     )
+    # Fotos subidas: se rechazan por encabezado, antes de decodificarlas, si superan estos píxeles
+    MAX_PHOTO_PIXELS: int = int(os.getenv("MAX_PHOTO_PIXELS", str(40_000_000)))
 
     # Defaults de dispositivo
     DEVICE_ID: str = os.getenv("DEVICE_ID", "default")
     DEVICE_TYPE: str = os.getenv("DEVICE_TYPE", "webcam")  # webcam | rtsp
+    DEVICE_SOURCE: str = os.getenv("DEVICE_SOURCE", "0")  # índice de la cámara o URL rtsp:// / http://
+    # Varias cámaras en un mismo proceso: "aula1=0,aula2=1" (id=fuente).
+    # Si está vacío se usa una única cámara DEVICE_ID=DEVICE_SOURCE.
+    DEVICES: str = os.getenv("DEVICES", "")
+    # Sin ventana local de OpenCV ni dibujo (servidores sin entorno gráfico)
+    HEADLESS: bool = os.getenv("HEADLESS", "false").lower() in ("1", "true", "yes")
     DEVICE_WIDTH: int = int(os.getenv("DEVICE_WIDTH", "640"))
     DEVICE_HEIGHT: int = int(os.getenv("DEVICE_HEIGHT", "480"))
     DEVICE_FPS: int = int(os.getenv("DEVICE_FPS", "30"))
     DEBOUNCE_SECONDS: int = int(os.getenv("DEBOUNCE_SECONDS", "300"))
 
+    # Detector de rostros: "haar" (cascada, rápido) o "dnn" (SSD de OpenCV en CPU,
+    # detecta perfiles y poca luz). Por cámara: "aula1=dnn,pasillo=haar" (id=detector)
+    DETECTOR_BACKEND: str = os.getenv("DETECTOR_BACKEND", "haar")
+    DEVICE_DETECTORS: str = os.getenv("DEVICE_DETECTORS", "")
+    DETECTOR_MIN_CONFIDENCE: float = float(os.getenv("DETECTOR_MIN_CONFIDENCE", "0.5"))
+    DETECTOR_DNN_MODEL: str = os.getenv(
+        "DETECTOR_DNN_MODEL",
+        os.path.normpath(
+            os.path.join(os.path.dirname(__file__), "..", "models", "res10_300x300_ssd_iter_140000.caffemodel")
+        ),
+    )
+    DETECTOR_DNN_CONFIG: str = os.getenv(
+        "DETECTOR_DNN_CONFIG",
+        os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "models", "deploy.prototxt")),
+    )
+
+    # Cámaras IP (RTSP/HTTP): reconexión con backoff exponencial
+    STREAM_RECONNECT_MIN_SECONDS: float = float(os.getenv("STREAM_RECONNECT_MIN_SECONDS", "1"))
+    STREAM_RECONNECT_MAX_SECONDS: float = float(os.getenv("STREAM_RECONNECT_MAX_SECONDS", "30"))
+    # Sin cuadros nuevos durante este tiempo se considera el stream caído
+    STREAM_STALL_SECONDS: float = float(os.getenv("STREAM_STALL_SECONDS", "5"))
+    STREAM_RTSP_TRANSPORT: str = os.getenv("STREAM_RTSP_TRANSPORT", "tcp")  # tcp | udp
+
+    # Vista previa remota (MJPEG / WebSocket)
+    PREVIEW_JPEG_QUALITY: int = int(os.getenv("PREVIEW_JPEG_QUALITY", "80"))
+    PREVIEW_MAX_FPS: float = float(os.getenv("PREVIEW_MAX_FPS", "15"))
+
+    # Procesos de reconocimiento (dlib) compartidos por todas las cámaras; 0 = en el mismo hilo
+    RECOGNITION_WORKERS: int = int(
+        os.getenv("RECOGNITION_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))
+    )
+
+    # Puente hacia el event loop de la app para los listeners de detección
+    LISTENER_QUEUE_SIZE: int = int(os.getenv("LISTENER_QUEUE_SIZE", "100"))
+    LISTENER_QUEUE_POLICY: str = os.getenv("LISTENER_QUEUE_POLICY", "coalesce")  # coalesce | drop_oldest
+    LISTENER_MAX_CONCURRENCY: int = int(os.getenv("LISTENER_MAX_CONCURRENCY", "4"))
+
+    # Eventos de presencia: segundos sin ver a alguien para considerarlo fuera,
+    # y cada cuánto se repite "recognized" mientras sigue presente
+    PRESENCE_LEAVE_SECONDS: float = float(os.getenv("PRESENCE_LEAVE_SECONDS", "5"))
+    PRESENCE_REPEAT_SECONDS: float = float(os.getenv("PRESENCE_REPEAT_SECONDS", "60"))
+
+    # Journal de asistencias pendientes de escribir (recuperación tras una caída)
+    ATTENDANCE_JOURNAL_PATH: str = os.getenv(
+        "ATTENDANCE_JOURNAL_PATH",
+        os.path.normpath(
+            os.path.join(os.path.dirname(__file__), "..", "cache", "attendance_journal.jsonl")
+        ),
+    )
+
+    # Índice de búsqueda de la galería: "flat" (exacto) o "ivf" (aproximado, para 100k+ rostros)
+    FACE_INDEX: str = os.getenv("FACE_INDEX", "flat")
+    FACE_INDEX_NLIST: int = int(os.getenv("FACE_INDEX_NLIST", "0"))  # 0 = ~sqrt(N)
+    FACE_INDEX_NPROBE: int = int(os.getenv("FACE_INDEX_NPROBE", "8"))
+
+    # Embeddings por persona: fotos de alta más capturas en vivo (se indexa también su centroide)
+    GALLERY_MAX_EXEMPLARS: int = int(os.getenv("GALLERY_MAX_EXEMPLARS", "5"))
+    # Capturas en vivo: sólo coincidencias muy seguras (distancia baja y lejos de la
+    # segunda identidad) que además aporten variedad, como mucho una por intervalo
+    HARVEST_ENABLED: bool = os.getenv("HARVEST_ENABLED", "true").lower() in ("1", "true", "yes")
+    HARVEST_MAX_DISTANCE: float = float(os.getenv("HARVEST_MAX_DISTANCE", "0.4"))
+    HARVEST_MIN_MARGIN: float = float(os.getenv("HARVEST_MIN_MARGIN", "0.15"))
+    HARVEST_MIN_NOVELTY: float = float(os.getenv("HARVEST_MIN_NOVELTY", "0.2"))
+    HARVEST_INTERVAL_SECONDS: float = float(os.getenv("HARVEST_INTERVAL_SECONDS", "300"))
+
+    # Alta masiva (POST /people/bulk): hilos que decodifican y detectan, filas por
+    # tanda (cada tanda se codifica junta y se inserta con un solo insert_many) y filas por pedido
+    BULK_WORKERS: int = int(os.getenv("BULK_WORKERS", str(os.cpu_count() or 2)))
+    BULK_CHUNK_SIZE: int = int(os.getenv("BULK_CHUNK_SIZE", "32"))
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", "2000"))
+
+    # Datos derivados de la galería: centroides IVF y capturas en vivo (fuera de MEDIA_ROOT
+    # para no servirlos vía /static); los embeddings de las fotos se guardan en MongoDB
+    EMBEDDINGS_CACHE_DIR: str = os.getenv(
+        "EMBEDDINGS_CACHE_DIR",
+        os.path.normpath(
+            os.path.join(os.path.dirname(__file__), "..", "cache", "embeddings")
+        ),
+    )
+
+
+def parse_devices(s: Settings) -> Dict[str, str]:
+    """Devuelve {device_id: source} a partir de DEVICES o de DEVICE_ID/DEVICE_SOURCE."""
+    devices: Dict[str, str] = {}
+    for item in s.DEVICES.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        device_id, sep, source = item.partition("=")
+        if not sep or not device_id.strip() or not source.strip():
+            raise ValueError(f"Entrada inválida en DEVICES: '{item}' (formato id=fuente)")
+        devices[device_id.strip()] = source.strip()
+    return devices or {s.DEVICE_ID: s.DEVICE_SOURCE}
+
+
+def parse_device_detectors(s: Settings) -> Dict[str, str]:
+    """Devuelve {device_id: detector}: DETECTOR_BACKEND salvo lo indicado en DEVICE_DETECTORS."""
+    detectors = {device_id: s.DETECTOR_BACKEND for device_id in parse_devices(s)}
+    for item in s.DEVICE_DETECTORS.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        device_id, sep, detector = item.partition("=")
+        if not sep:
+            raise ValueError(f"Entrada inválida en DEVICE_DETECTORS: '{item}' (formato id=detector)")
+        detectors[device_id.strip()] = detector.strip()
+    return detectors
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
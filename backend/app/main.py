@@ -2,6 +2,8 @@ from datetime import datetime, timezone
 import os
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -53,9 +55,35 @@ def create_app() -> FastAPI:
         # Crear índices mínimos
         await app.state.db["attendances"].create_index("timestamp")
         await app.state.db["attendances"].create_index("person_id")
+        # Una asistencia por persona y día (sólo documentos con "day"); hace idempotente el write-behind
+        await app.state.db["attendances"].create_index(
+            [("person_id", 1), ("day", 1)],
+            unique=True,
+            partialFilterExpression={"day": {"$exists": True}},
+        )
         await app.state.db["people"].create_index("full_name")
 
+        from .modules.attendances import service as attendances_service
+        from .modules.people import service as people_service
+
+        # Personas cargadas antes de guardar embeddings en la base: se calculan una sola vez
+        await people_service.backfill_embeddings(app.state.db)
+        await attendances_service.startup(app.state.db)
+
     async def on_shutdown() -> None:
+        from .modules.attendances import service as attendances_service
+        from .modules.attendances.devices import devices, recognition_pool
+
+        detectors = devices.all()
+        for detector in detectors:
+            detector.stop_detection()
+        # Ninguna cámara debe seguir codificando cuando se cierra el pool
+        for detector in detectors:
+            if not await run_in_threadpool(detector.join, 5.0):
+                print(f"La captura de {detector.device_id} no terminó a tiempo")
+        recognition_pool.shutdown()
+        await attendances_service.shutdown()
+
         client: AsyncIOMotorClient = app.state.mongo_client
         client.close()
 
@@ -84,6 +112,19 @@ def create_app() -> FastAPI:
         uptime_sec = int((datetime.now(timezone.utc) - started_at).total_seconds())
         return {"status": "ok", "version": APP_VERSION, "uptime_sec": uptime_sec}
 
+    # Métricas (formato de texto de Prometheus)
+    @app.get(
+        "/metrics",
+        tags=["health"],
+        summary="Métricas",
+        description="Histogramas por etapa del pipeline de video, contadores de cuadros y caras, y colas de listeners",
+        response_class=PlainTextResponse,
+    )
+    async def metrics():
+        from .core.metrics import REGISTRY
+
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
     return app
 
 
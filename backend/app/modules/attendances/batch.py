@@ -0,0 +1,245 @@
+"""Procesamiento offline de grabaciones.
+
+Corre el mismo pipeline de FaceDetector sobre archivos de video, sin ritmo de
+tiempo real, y genera un reporte (JSON o CSV) y opcionalmente las asistencias.
+Sirve para cargar asistencias de clases grabadas y para medir el rendimiento
+sin cámara.
+
+    python -m app.modules.attendances.batch clases/ --every 1 --report reporte.json
+    python -m app.modules.attendances.batch clase.mp4 --write-db --recorded-at 2024-05-02T13:00:00+00:00
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from . import repository as repo
+from .events import ENTERED, PresenceTracker
+from .face_detector import FaceDetector
+from .face_index import build_index
+from .face_library import FaceLibrary
+from .recognition import RecognitionPool
+from .sources import FileSource
+from ..people import repository as people_repo
+from ...core.config import settings
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".webm", ".m4v")
+UNKNOWN_NAME = "Desconocido"
+
+
+def list_videos(path: str) -> List[str]:
+    """Un archivo, o los videos de una carpeta (no recursivo) en orden alfabético."""
+    if os.path.isfile(path):
+        return [path]
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No existe: {path}")
+    return [
+        os.path.join(path, name)
+        for name in sorted(os.listdir(path))
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    ]
+
+
+def process_video(
+    path: str,
+    library: FaceLibrary,
+    recognizer: RecognitionPool,
+    every_seconds: float = 0.0,
+) -> Dict[str, Any]:
+    """Procesa un video completo y resume quién aparece y cuándo (segundos desde el inicio)."""
+    # Sin capturas en vivo: una grabación no debe modificar la galería
+    detector = FaceDetector(
+        f"batch:{os.path.basename(path)}", None, library.gallery, recognizer, headless=True, harvest=False
+    )
+    # Las apariciones se cuentan con el reloj del video, no con el de la máquina
+    presence = PresenceTracker(
+        leave_seconds=settings.PRESENCE_LEAVE_SECONDS,
+        repeat_seconds=settings.PRESENCE_REPEAT_SECONDS,
+        unknown_name=UNKNOWN_NAME,
+    )
+    source = FileSource(path, every_seconds=every_seconds)
+    identities: Dict[str, Dict[str, Any]] = {}
+    processed = 0
+    unknown = 0
+    duration = 0.0
+
+    started = time.perf_counter()
+    for decoded in source:
+        processed += 1
+        duration = decoded.timestamp
+        # Grabación: no se espeja como la vista en vivo
+        detections = detector.process_frame(decoded.frame, mirror=False)
+        for detection in detections:
+            name = detection[4]
+            if name == UNKNOWN_NAME:
+                unknown += 1
+                continue
+            identity = identities.get(name)
+            if identity is None:
+                identity = identities[name] = {
+                    "first_seen": decoded.timestamp,
+                    "last_seen": decoded.timestamp,
+                    "sightings": 0,
+                    "appearances": 0,
+                }
+            identity["last_seen"] = decoded.timestamp
+            identity["sightings"] += 1
+        for event in presence.update(detections, now=decoded.timestamp):
+            if event.kind == ENTERED:
+                identities[event.name]["appearances"] += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        "file": path,
+        "video_fps": source.stats()["fps"],
+        "duration_seconds": round(duration, 2),
+        "frames_read": source.frames_read,
+        "frames_processed": processed,
+        "elapsed_seconds": round(elapsed, 3),
+        "processing_fps": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "unknown_sightings": unknown,
+        "identities": {
+            name: {
+                **info,
+                "first_seen": round(info["first_seen"], 2),
+                "last_seen": round(info["last_seen"], 2),
+            }
+            for name, info in sorted(identities.items())
+        },
+    }
+
+
+def _recording_start(path: str, recorded_at: Optional[datetime], duration: float) -> datetime:
+    if recorded_at is not None:
+        return recorded_at
+    # Sin fecha explícita: la modificación del archivo aproxima el fin de la grabación
+    modified = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+    return modified - timedelta(seconds=duration)
+
+
+def attendance_docs(report: Dict[str, Any], recorded_at: Optional[datetime]) -> List[Dict[str, Any]]:
+    """Una asistencia por identidad, con la hora de su primera aparición en el video."""
+    start = _recording_start(report["file"], recorded_at, report["duration_seconds"])
+    docs = []
+    for name, info in report["identities"].items():
+        attendance_time = start + timedelta(seconds=info["first_seen"])
+        docs.append(
+            {
+                "person_id": name,
+                "attendance_time": attendance_time,
+                "day": attendance_time.date().isoformat(),
+            }
+        )
+    return docs
+
+
+async def load_gallery(library: FaceLibrary) -> None:
+    """Carga la galería con los embeddings guardados en las personas (sin leer imágenes)."""
+    client = AsyncIOMotorClient(settings.MONGODB_URI)
+    try:
+        library.load(await people_repo.list_face_embeddings(client[settings.DB_NAME]))
+    finally:
+        client.close()
+
+
+async def write_attendances(docs: List[Dict[str, Any]]) -> None:
+    client = AsyncIOMotorClient(settings.MONGODB_URI)
+    try:
+        # El índice único (person_id, day) descarta las asistencias ya registradas
+        await repo.insert_attendances(client[settings.DB_NAME], docs)
+    finally:
+        client.close()
+
+
+def write_report(reports: List[Dict[str, Any]], path: str) -> None:
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "name", "first_seen", "last_seen", "sightings", "appearances"])
+            for report in reports:
+                for name, info in report["identities"].items():
+                    writer.writerow(
+                        [
+                            report["file"],
+                            name,
+                            info["first_seen"],
+                            info["last_seen"],
+                            info["sightings"],
+                            info["appearances"],
+                        ]
+                    )
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Procesa grabaciones y genera asistencias/reportes.")
+    parser.add_argument("path", help="Archivo de video o carpeta con videos")
+    parser.add_argument("--report", help="Ruta del reporte (.json o .csv)")
+    parser.add_argument("--every", type=float, default=0.0, help="Procesar un cuadro cada N segundos de video (0 = todos)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos de reconocimiento")
+    parser.add_argument("--jobs", type=int, default=2, help="Videos procesados en paralelo")
+    parser.add_argument("--write-db", action="store_true", help="Registrar las asistencias en MongoDB")
+    parser.add_argument("--recorded-at", type=datetime.fromisoformat, help="Inicio de la grabación (ISO 8601, se aplica a todos los archivos); por defecto se estima con la fecha de cada archivo")
+    args = parser.parse_args(argv)
+
+    recorded_at = args.recorded_at
+    if recorded_at is not None and recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+
+    videos = list_videos(args.path)
+    if not videos:
+        print(f"No se encontraron videos en '{args.path}'")
+        return
+
+    library = FaceLibrary(
+        settings.EMBEDDINGS_CACHE_DIR,
+        index=build_index(
+            settings.FACE_INDEX,
+            path=settings.EMBEDDINGS_CACHE_DIR,
+            nlist=settings.FACE_INDEX_NLIST,
+            nprobe=settings.FACE_INDEX_NPROBE,
+        ),
+        max_exemplars=settings.GALLERY_MAX_EXEMPLARS,
+    )
+    asyncio.run(load_gallery(library))
+    recognizer = RecognitionPool(args.workers)
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            reports = list(
+                executor.map(lambda path: process_video(path, library, recognizer, args.every), videos)
+            )
+    finally:
+        recognizer.shutdown()
+    elapsed = time.perf_counter() - started
+
+    for report in reports:
+        print(
+            f"{report['file']}: {report['frames_processed']}/{report['frames_read']} cuadros, "
+            f"{report['processing_fps']} fps, {len(report['identities'])} personas"
+        )
+    frames = sum(report["frames_processed"] for report in reports)
+    print(f"Total: {frames} cuadros en {elapsed:.1f}s ({frames / elapsed if elapsed > 0 else 0:.1f} fps)")
+
+    if args.report:
+        write_report(reports, args.report)
+        print(f"Reporte guardado en '{args.report}'")
+
+    if args.write_db:
+        docs = [doc for report in reports for doc in attendance_docs(report, recorded_at)]
+        asyncio.run(write_attendances(docs))
+        print(f"Se enviaron {len(docs)} asistencias a la base")
+
+
+if __name__ == "__main__":
+    main()
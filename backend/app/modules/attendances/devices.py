@@ -0,0 +1,94 @@
+import os
+from typing import Dict, List, Union
+
+import cv2
+
+from .face_detector import FaceDetector
+from .face_index import build_index
+from .face_library import FaceLibrary
+from .recognition import RecognitionPool
+from .video_capture import VideoCapture, VideoConfig
+from ...core.config import Settings, parse_device_detectors, parse_devices, settings
+from ...utils.models import models
+
+
+class DeviceRegistry:
+    """Una instancia de VideoCapture/FaceDetector por cámara configurada.
+
+    Todas comparten la misma galería (sólo lectura para los detectores) y el
+    mismo pool de reconocimiento.
+    """
+
+    def __init__(
+        self,
+        config: Settings,
+        library: FaceLibrary,
+        recognizer: RecognitionPool,
+    ) -> None:
+        self._detectors: Dict[str, FaceDetector] = {}
+        detector_kinds = parse_device_detectors(config)
+        for device_id, source in parse_devices(config).items():
+            self._detectors[device_id] = self._build(
+                config, device_id, source, detector_kinds[device_id], library, recognizer
+            )
+
+    @staticmethod
+    def _build(
+        config: Settings,
+        device_id: str,
+        source: str,
+        detector_kind: str,
+        library: FaceLibrary,
+        recognizer: RecognitionPool,
+    ) -> FaceDetector:
+        try:
+            video_source: Union[int, str] = int(source)
+        except ValueError:
+            # URL (rtsp://, http://) o archivo: se lee como stream con reconexión
+            video_source = source
+        cap = VideoCapture(
+            VideoConfig(
+                video_source,
+                reconnect_min_seconds=config.STREAM_RECONNECT_MIN_SECONDS,
+                reconnect_max_seconds=config.STREAM_RECONNECT_MAX_SECONDS,
+                stall_seconds=config.STREAM_STALL_SECONDS,
+            ),
+            name=device_id,
+        )
+        if isinstance(video_source, int):
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.DEVICE_WIDTH)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.DEVICE_HEIGHT)
+            cap.set(cv2.CAP_PROP_FPS, config.DEVICE_FPS)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # Cada cámara tiene su propia instancia del detector (cv2.dnn no es seguro entre hilos);
+        # los archivos de modelo se leen una sola vez para todas
+        detector = models.new_detector(detector_kind, scale_factor=FaceDetector.haar_scale_factor)
+        return FaceDetector(device_id, cap, library.gallery, recognizer, detector=detector)
+
+    def get(self, device_id: str) -> FaceDetector:
+        """Devuelve el detector de la cámara; KeyError si no está configurada."""
+        return self._detectors[device_id]
+
+    def ids(self) -> List[str]:
+        return list(self._detectors)
+
+    def all(self) -> List[FaceDetector]:
+        return list(self._detectors.values())
+
+
+# FFmpeg lee esta variable al abrir cada stream (TCP evita cuadros corruptos por pérdida de paquetes UDP)
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", f"rtsp_transport;{settings.STREAM_RTSP_TRANSPORT}")
+
+# Vacía hasta que el arranque de la app la carga desde MongoDB (service.startup)
+face_library = FaceLibrary(
+    settings.EMBEDDINGS_CACHE_DIR,
+    index=build_index(
+        settings.FACE_INDEX,
+        path=settings.EMBEDDINGS_CACHE_DIR,
+        nlist=settings.FACE_INDEX_NLIST,
+        nprobe=settings.FACE_INDEX_NPROBE,
+    ),
+    max_exemplars=settings.GALLERY_MAX_EXEMPLARS,
+)
+recognition_pool = RecognitionPool(settings.RECOGNITION_WORKERS)
+devices = DeviceRegistry(settings, face_library, recognition_pool)
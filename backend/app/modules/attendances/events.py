@@ -0,0 +1,85 @@
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+ENTERED = "entered"
+RECOGNIZED = "recognized"
+LEFT = "left"
+
+
+class PresenceEvent(NamedTuple):
+    """Cambio de presencia de una identidad frente a una cámara."""
+
+    kind: str  # entered | recognized | left
+    name: str
+    track_id: Optional[int]
+    timestamp: float  # time.time()
+
+
+class _Presence:
+    __slots__ = ("first_seen", "last_seen", "last_emitted", "track_id")
+
+    def __init__(self, now: float, track_id: Optional[int]) -> None:
+        self.first_seen = now
+        self.last_seen = now
+        self.last_emitted = now
+        self.track_id = track_id
+
+
+class PresenceTracker:
+    """Convierte las detecciones cuadro a cuadro en eventos por identidad.
+
+    - entered: la identidad aparece (o reaparece tras haberse ido).
+    - recognized: sigue presente; se repite como mucho cada `repeat_seconds`.
+    - left: no se la ve desde hace `leave_seconds`.
+    Las caras desconocidas no generan eventos.
+    """
+
+    def __init__(
+        self,
+        leave_seconds: float = 5.0,
+        repeat_seconds: float = 60.0,
+        unknown_name: str = "Desconocido",
+    ) -> None:
+        self.leave_seconds = leave_seconds
+        self.repeat_seconds = repeat_seconds
+        self.unknown_name = unknown_name
+        self._present: Dict[str, _Presence] = {}
+
+    @property
+    def present(self) -> List[str]:
+        return list(self._present)
+
+    def reset(self) -> List[PresenceEvent]:
+        """Olvida el estado y devuelve un evento left por cada identidad presente."""
+        now = time.time()
+        events = [PresenceEvent(LEFT, name, p.track_id, now) for name, p in self._present.items()]
+        self._present.clear()
+        return events
+
+    def update(self, detections: Sequence[tuple], now: Optional[float] = None) -> List[PresenceEvent]:
+        """detections: tuplas (X, Y, W, H, name, color, track_id) de un cuadro procesado."""
+        now = time.time() if now is None else now
+        events: List[PresenceEvent] = []
+        seen = set()
+        for detection in detections:
+            name, track_id = detection[4], detection[6]
+            if not name or name == self.unknown_name or name in seen:
+                continue
+            seen.add(name)
+            presence = self._present.get(name)
+            if presence is None:
+                self._present[name] = _Presence(now, track_id)
+                events.append(PresenceEvent(ENTERED, name, track_id, now))
+                continue
+            presence.last_seen = now
+            presence.track_id = track_id
+            if now - presence.last_emitted >= self.repeat_seconds:
+                presence.last_emitted = now
+                events.append(PresenceEvent(RECOGNIZED, name, track_id, now))
+
+        for name in list(self._present):
+            presence = self._present[name]
+            if name not in seen and now - presence.last_seen >= self.leave_seconds:
+                del self._present[name]
+                events.append(PresenceEvent(LEFT, name, presence.track_id, now))
+        return events
@@ -6,9 +6,7 @@ import os
 import face_recognition
 import numpy as np
 
-from ...utils.face_utils import resolve_haarcascade
-
-face_detector = cv2.CascadeClassifier(resolve_haarcascade())
+from ...utils.models import models
 
 class FaceExtractor:
     def __init__(self, output_folder: str) -> None:
@@ -25,14 +23,12 @@ class FaceExtractor:
         if image is None:
             raise ValueError("Error al leer la imagen")
         
-        image_gray_scale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
         # Obtenemos los datos de las caras en la imagen
-        faces = face_detector.detectMultiScale(image_gray_scale, 1.1, 5)
+        faces = models.detector().detect(image)
         if len(faces) == 0:
             raise ValueError("No se detectaron caras en la imagen")
 
-        for i, (x, y, w, h) in enumerate(faces):
+        for i, (x, y, w, h, _) in enumerate(faces):
             # obtenemos la imagen de la cara
             face = image[y : y + h, x : x + w]
 
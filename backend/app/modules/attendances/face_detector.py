@@ -1,80 +1,112 @@
-import os
-from typing import Union
+import time
+from threading import Lock
+from typing import Iterable, List, Optional
+
 import cv2
-import face_recognition
-import numpy as np
 
-from .video_capture import VideoCapture, VideoConfig
-from ...utils.face_utils import resolve_haarcascade
+from .video_capture import VideoCapture
+from .gallery import FaceGallery, RosterGallery
+from .recognition import RecognitionPool
+from .tracker import IoUTracker
+from .events import PresenceTracker
+from .viewers import WindowViewer
+from ...utils.detectors import Detection, FaceDetectorBackend
+from ...utils.models import models
 from .loop_manager import LoopManager
-from ..people.storage import get_media_dir as get_people_media_dir
+from ...core.config import settings
+from ...core.metrics import (
+    FACES_DETECTED,
+    FACES_MATCHED,
+    FACES_UNKNOWN,
+    FRAMES_PROCESSED,
+    STAGE_SECONDS,
+)
 
 
 class FaceDetector:
+    """Detección y reconocimiento para una cámara.
+
+    Cada instancia tiene su propia captura, hilos y listeners; la galería y el
+    pool de reconocimiento se comparten entre todas las cámaras del proceso.
+    """
+
+    device_id: str
     _cap: VideoCapture
-    _face_detector: cv2.CascadeClassifier
-    _faces_folder: str
-    _loop_manager: LoopManager = LoopManager(lambda: face_detector._start_detection())
+    _face_detector: FaceDetectorBackend
+    _loop_manager: LoopManager
 
     # Parámetros de rendimiento
-    process_every_n = 2  # procesa 1 de cada 2 cuadros
+    process_every_n = 2  # el reconocimiento recibe 1 de cada 2 cuadros
     scale = 0.5  # detectar a media resolución
-    last_detections = []  # lista de tuplas (X,Y,W,H,name,color)
+    haar_scale_factor = 1.2  # pasos más gruesos que al dar de alta: el cuadro ya está reducido
 
-    # Parámetros de codificación
-    faces_encodings = []
-    faces_names = []
-
-    detect_faces_listeners = []
-
-    def __init__(self, cap: VideoCapture, faces_folder: str) -> None:
+    def __init__(
+        self,
+        device_id: str,
+        cap: Optional[VideoCapture],
+        gallery: FaceGallery,
+        recognizer: RecognitionPool,
+        headless: bool = settings.HEADLESS,
+        harvest: bool = settings.HARVEST_ENABLED,
+        detector=None,
+    ) -> None:
+        """harvest: sumar a la galería capturas en vivo de coincidencias muy seguras.
+        detector: detector de rostros (ver utils.detectors); por defecto DETECTOR_BACKEND."""
+        self.device_id = device_id
         self._cap = cap
-        self._face_detector = cv2.CascadeClassifier(resolve_haarcascade())
-        self._faces_folder = faces_folder
-
-        self._cap.add_listener(lambda frame: self.detect_faces(frame))
-
-        if not os.path.exists(faces_folder):
-            os.makedirs(faces_folder, exist_ok=True)
-        else:
-            self.load_faces_from_folder(faces_folder)
-
-    def _get_encodings(self, image: np.ndarray) -> Union[np.ndarray, None]:
-        """Obtiene los embeddings de un rostro en una imagen."""
-        try:
-            # Convertir a RGB y redimensionar para acelerar el cómputo
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image_rgb_small = cv2.resize(image_rgb, (150, 150))
-            # Asegurar que sea contiguo en memoria
-            image_rgb_small = np.ascontiguousarray(image_rgb_small, dtype=np.uint8)
-            encodings = face_recognition.face_encodings(
-                image_rgb_small, known_face_locations=[(0, 150, 150, 0)]
-            )
-            return encodings[0] if encodings else None
-        except Exception as e:
-            print(f"Error al obtener encodings: {e}")
-            return None
-
-    def load_faces_from_folder(self, folder_path: str):
-        """Carga los rostros desde una carpeta y  carga los encodings."""
-        loaded_count = 0
-        for file_name in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, file_name)
-            image = cv2.imread(file_path)
-            if image is None:
-                print(
-                    f"Error al cargar la imagen: {file_name}. Verifica que sea una imagen válida."
-                )
-                continue
+        if detector is None:
+            detector = models.new_detector(scale_factor=self.haar_scale_factor)
+        self._face_detector = detector
+        self._loop_manager = LoopManager(
+            self._start_detection,
+            max_queue=settings.LISTENER_QUEUE_SIZE,
+            policy=settings.LISTENER_QUEUE_POLICY,
+            max_concurrency=settings.LISTENER_MAX_CONCURRENCY,
+            name=device_id,
+        )
+        self.gallery = gallery
+        # Galería contra la que se empareja: la completa o la vista del roster de la sesión
+        self._matcher = gallery
+        self._recognizer = recognizer
+        self._harvest = harvest
+        self.is_running = False
+        self.last_detections = []  # lista de tuplas (X,Y,W,H,name,color,track_id)
+        self.detect_faces_listeners = []
+        self.presence_listeners = []
+        # Eventos por identidad (entró / sigue / se fue) en lugar de cada cuadro
+        self._presence = PresenceTracker(
+            leave_seconds=settings.PRESENCE_LEAVE_SECONDS,
+            repeat_seconds=settings.PRESENCE_REPEAT_SECONDS,
+        )
+        # Seguimiento entre cuadros: sólo se codifican pistas nuevas o con confianza baja
+        self._tracker = IoUTracker()
+        # Series de métricas por etapa (se resuelven una vez, no en cada cuadro)
+        self._m_stage = {
+            stage: STAGE_SECONDS.labels(device_id, stage)
+            for stage in ("flip", "resize", "detect", "encode", "match", "draw", "dispatch")
+        }
+        self._m_frames = FRAMES_PROCESSED.labels(device_id)
+        self._m_faces = FACES_DETECTED.labels(device_id)
+        self._m_matched = FACES_MATCHED.labels(device_id)
+        self._m_unknown = FACES_UNKNOWN.labels(device_id)
 
-            encoding = self._get_encodings(image)
-            if encoding is not None:
-                self.faces_encodings.append(encoding)
-                self.faces_names.append(file_name.split(".")[0])
-                loaded_count += 1
-            else:
-                print(f"No se detectó un rostro válido en la imagen: {file_name}")
-        print(f"Se cargaron {loaded_count} rostros desde '{folder_path}'")
+        # Destinos del cuadro anotado; sin ninguno no se dibuja nada
+        self._viewers = []
+        self._viewers_lock = Lock()
+        if not headless:
+            self.attach_viewer(WindowViewer(f"Frame - {self.device_id}"))
+
+        # Sin captura (procesamiento offline, ver batch.py) sólo se usa process_frame
+        if self._cap is None:
+            return
+        # Reconocimiento y dibujo son etapas independientes: el dibujo sigue el
+        # ritmo de la cámara y el reconocimiento toma el cuadro más reciente.
+        self._cap.add_listener(
+            self.detect_faces, name="recognition", every_n=self.process_every_n
+        )
+        self._cap.add_listener(
+            self.render_frame, name="render", active=self.has_viewers
+        )
 
     def _draw_label(
         self,
@@ -132,86 +164,207 @@ class FaceDetector:
         )
 
     def detect_faces(self, frame: cv2.typing.MatLike):
-        frame = cv2.flip(frame, 1)
-        process_this_frame = self._cap.frame_count % self.process_every_n == 0
-        if process_this_frame:
-            # Detección en resolución reducida
-            small = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale)
-            gray_small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
-            faces_small = self._face_detector.detectMultiScale(gray_small, 1.2, 5)
-            current = []
-            if len(faces_small) > 0:
-                inv_scale = 1.0 / self.scale
-                for sx, sy, sw, sh in faces_small:
-                    X = int(sx * inv_scale)
-                    Y = int(sy * inv_scale)
-                    W = int(sw * inv_scale)
-                    H = int(sh * inv_scale)
-                    roi = frame[Y : Y + H, X : X + W]
-                    if roi.size == 0:
-                        continue
-                    roi_rgb = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
-                    # Reducir tamaño del ROI para acelerar el cómputo del embedding
-                    roi_rgb_small = cv2.resize(roi_rgb, (150, 150))
-                    # Asegurar uint8 y contigüidad en memoria (evita errores en Windows/dlib)
-                    roi_rgb_small = np.ascontiguousarray(roi_rgb_small, dtype=np.uint8)
-                    encs = face_recognition.face_encodings(
-                        roi_rgb_small,
-                        known_face_locations=[(0, 150, 150, 0)],
-                        num_jitters=1,
-                    )
-                    name = "Desconocido"
-                    color = (50, 50, 255)
-                    if encs:
-                        actual = encs[0]
-                        result = face_recognition.compare_faces(
-                            self.faces_encodings, actual
-                        )
-                        if True in result:
-                            index = result.index(True)
-                            name = self.faces_names[index]
-                            color = (125, 220, 0)
-                    current.append((X, Y, W, H, name, color))
-            self.last_detections = current
-        # Dibujo de las últimas detecciones conocidas (evitar desbordes del texto)
-        for X, Y, W, H, name, color in self.last_detections:
-            cv2.rectangle(frame, (X, Y), (X + W, Y + H), color, 2)
-            self._draw_label(frame, X, Y, W, H, name, color)
+        """Etapa de reconocimiento: procesa el cuadro y notifica a los listeners."""
+        self.last_detections = self.process_frame(frame)
 
+        start = time.perf_counter()
         # Llamar a los listeners
         if len(self.detect_faces_listeners) > 0:
             for listener in self.detect_faces_listeners:
+                # Si el listener anterior no terminó, sólo importa la detección más reciente
                 self._loop_manager.delegar_async(
                     listener,
                     self.last_detections,
+                    key=listener,
                 )
 
-        cv2.imshow("Frame", frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            self._loop_manager.stop()
+        self._publish_presence(self._presence.update(self.last_detections))
+        self._m_stage["dispatch"].observe(time.perf_counter() - start)
+
+    def detect(self, frame: cv2.typing.MatLike) -> List[Detection]:
+        """Detecta caras en resolución reducida.
+        Devuelve las detecciones (con su confianza) en coordenadas del cuadro."""
+        start = time.perf_counter()
+        small = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale)
+        resized = time.perf_counter()
+        detections = self._face_detector.detect(small)
+        self._m_stage["resize"].observe(resized - start)
+        self._m_stage["detect"].observe(time.perf_counter() - resized)
+        inv_scale = 1.0 / self.scale
+        return [
+            Detection(
+                int(d.x * inv_scale), int(d.y * inv_scale), int(d.w * inv_scale), int(d.h * inv_scale), d.confidence
+            )
+            for d in detections
+        ]
+
+    def detect_boxes(self, frame: cv2.typing.MatLike):
+        """Devuelve las cajas (X, Y, W, H) detectadas en coordenadas del cuadro y sus recortes."""
+        boxes = []
+        rois = []
+        for X, Y, W, H, _ in self.detect(frame):
+            roi = frame[Y : Y + H, X : X + W]
+            if roi.size == 0:
+                continue
+            boxes.append((X, Y, W, H))
+            rois.append(roi)
+        return boxes, rois
+
+    def process_frame(self, frame: cv2.typing.MatLike, mirror: bool = True):
+        """Detecta, codifica y empareja las caras de un cuadro.
+        Devuelve tuplas (X, Y, W, H, name, color, track_id) en coordenadas del cuadro
+        (espejado si mirror=True, como se muestra en vivo)."""
+        self._m_frames.inc()
+        if mirror:
+            start = time.perf_counter()
+            frame = cv2.flip(frame, 1)
+            self._m_stage["flip"].observe(time.perf_counter() - start)
+        boxes, rois = self.detect_boxes(frame)
+        self._m_faces.inc(len(boxes))
+        current = []
+        tracks = self._tracker.update(boxes)
+        pending = [i for i, track in enumerate(tracks) if track.needs_encoding]
+        # La codificación se reparte en el pool compartido, en el orden de las cajas
+        encoded_tracks = []
+        encodings = []
+        start = time.perf_counter()
+        results = self._recognizer.encode([rois[i] for i in pending])
+        if pending:
+            self._m_stage["encode"].observe(time.perf_counter() - start)
+        for i, encoding in zip(pending, results):
+            if encoding is None:
+                self._tracker.set_identity(tracks[i], None, float("inf"))
+            else:
+                encoded_tracks.append(tracks[i])
+                encodings.append(encoding)
+        # Emparejar todas las caras codificadas del cuadro contra la galería de una vez
+        if encodings:
+            start = time.perf_counter()
+            matches = self._matcher.match(encodings)
+            self._m_stage["match"].observe(time.perf_counter() - start)
+            known = sum(1 for match in matches if match.is_known)
+            self._m_matched.inc(known)
+            self._m_unknown.inc(len(matches) - known)
+            for track, match in zip(encoded_tracks, matches):
+                self._tracker.set_identity(track, match.name, match.distance)
+            if self._harvest:
+                self._harvest_matches(encodings, matches)
+        for (X, Y, W, H), track in zip(boxes, tracks):
+            if track.name:
+                current.append((X, Y, W, H, track.name, (125, 220, 0), track.track_id))
+            else:
+                current.append((X, Y, W, H, "Desconocido", (50, 50, 255), track.track_id))
+        return current
+
+    @staticmethod
+    def _confident(match) -> bool:
+        return (
+            match.is_known
+            and match.distance <= settings.HARVEST_MAX_DISTANCE
+            and match.margin >= settings.HARVEST_MIN_MARGIN
+        )
+
+    def _harvest_matches(self, encodings, matches) -> None:
+        """Suma a la galería completa las caras reconocidas con mucha seguridad."""
+        candidates = [(e, m) for e, m in zip(encodings, matches) if self._confident(m)]
+        if candidates and self._matcher is not self.gallery:
+            # Con roster el margen sólo compara contra sus miembros (con uno solo es
+            # infinito): se confirma contra la galería completa, con el mismo nombre
+            full = self.gallery.match([encoding for encoding, _ in candidates])
+            candidates = [
+                (encoding, match)
+                for (encoding, match), check in zip(candidates, full)
+                if check.name == match.name and self._confident(check)
+            ]
+        for encoding, match in candidates:
+            self.gallery.harvest(
+                match.name,
+                encoding,
+                min_novelty=settings.HARVEST_MIN_NOVELTY,
+                min_interval=settings.HARVEST_INTERVAL_SECONDS,
+            )
+
+    def _publish_presence(self, events):
+        if not events:
+            return
+        for listener in self.presence_listeners:
+            # Sin clave: los eventos no se coalescen, cada uno cuenta
+            self._loop_manager.delegar_async(listener, events)
+
+    def has_viewers(self) -> bool:
+        return len(self._viewers) > 0
+
+    def attach_viewer(self, viewer):
+        """Agrega un destino del cuadro anotado (objeto con show(frame) y close())."""
+        with self._viewers_lock:
+            if viewer not in self._viewers:
+                self._viewers = self._viewers + [viewer]
+
+    def detach_viewer(self, viewer):
+        with self._viewers_lock:
+            self._viewers = [v for v in self._viewers if v is not viewer]
+
+    def render_frame(self, frame: cv2.typing.MatLike):
+        """Etapa de dibujo: sólo recibe cuadros si hay algún viewer conectado."""
+        viewers = self._viewers
+        if not viewers:
+            return
+        start = time.perf_counter()
+        frame = cv2.flip(frame, 1)
+        # Dibujo de las últimas detecciones conocidas (evitar desbordes del texto)
+        for X, Y, W, H, name, color, _track_id in self.last_detections:
+            cv2.rectangle(frame, (X, Y), (X + W, Y + H), color, 2)
+            self._draw_label(frame, X, Y, W, H, name, color)
+        self._m_stage["draw"].observe(time.perf_counter() - start)
+
+        for viewer in viewers:
+            viewer.show(frame)
 
     def on_detected_faces(self, listener):
         """Cada listener recibirá una lista de caras detectadas,
-        cada cara esta representada como (X, Y, W, H, name, color)"""
+        cada cara esta representada como (X, Y, W, H, name, color, track_id)"""
         self.detect_faces_listeners.append(listener)
 
+    def on_presence_events(self, listener):
+        """Cada listener recibirá una lista de PresenceEvent (entered, recognized, left)
+        sólo cuando cambia la presencia de alguna identidad."""
+        self.presence_listeners.append(listener)
+
     def _start_detection(self):
+        self._tracker.reset()
         self._cap.start(lambda: self._loop_manager.is_running())
+        for viewer in self._viewers:
+            viewer.close()
+        # Al cortar la captura todos los presentes se consideran fuera
+        self._publish_presence(self._presence.reset())
 
-    def start_detection(self):
-        """Presiona q para finalizar"""
-        self._loop_manager.start()
+    def start_detection(self, loop=None):
+        """Se detiene con stop_detection (POST /attendances/stop).
+        loop: event loop de la app donde se ejecutan los listeners asíncronos."""
+        self._loop_manager.start(loop)
         self.is_running = True
         
     def stop_detection(self):
         self._loop_manager.stop()
         self.is_running = False
 
+    def join(self, timeout: float = 5.0) -> bool:
+        """Espera a que la captura y sus etapas terminen tras stop_detection."""
+        return self._loop_manager.join(timeout)
+
+    def set_roster(self, names: Optional[Iterable[str]]) -> None:
+        """Restringe el emparejamiento a las identidades esperadas (None = toda la galería)."""
+        self._matcher = self.gallery if names is None else RosterGallery(self.gallery, names)
 
-cap = VideoCapture(VideoConfig())
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 30)
-cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    def pipeline_stats(self):
+        """Profundidad de cola y cuadros descartados por etapa del pipeline,
+        más la cola de listeners asíncronos."""
+        stats = {
+            **self._cap.stats(),
+            "detector": self._face_detector.kind,
+            "listeners": self._loop_manager.stats(),
+        }
+        if isinstance(self._matcher, RosterGallery):
+            stats["roster"] = {"size": len(self._matcher.roster), **self._matcher.stats}
+        return stats
 
-face_detector = FaceDetector(cap, get_people_media_dir())
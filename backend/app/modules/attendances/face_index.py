@@ -0,0 +1,385 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Dimensión de los embeddings de dlib / face_recognition
+EMBEDDING_DIM = 128
+
+FLAT = "flat"
+IVF = "ivf"
+
+# Filas por bloque al asignar vectores a centroides (acota la memoria temporal)
+_CHUNK = 8192
+
+
+def _sq_distances(queries: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+    """Distancias euclídeas al cuadrado (M, N): ||a||² + ||b||² - 2·a·b."""
+    q_sq = np.einsum("ij,ij->i", queries, queries)
+    d2 = q_sq[:, None] + sq_norms[None, :] - 2.0 * (queries @ matrix.T)
+    # Errores de redondeo pueden dejar valores levemente negativos
+    np.maximum(d2, 0.0, out=d2)
+    return d2
+
+
+def _top_k(d2: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Los k menores por fila, ordenados, sin ordenar toda la fila. Rellena con inf / -1."""
+    m, n = d2.shape
+    out_d = np.full((m, k), np.inf, dtype=np.float32)
+    out_ids = np.full((m, k), -1, dtype=np.int64)
+    if n == 0:
+        return out_d, out_ids
+    kk = min(k, n)
+    rows = np.arange(m)[:, None]
+    part = np.argpartition(d2, kk - 1, axis=1)[:, :kk] if n > kk else np.tile(np.arange(n), (m, 1))
+    part_d = d2[rows, part]
+    order = np.argsort(part_d, axis=1)
+    out_d[:, :kk] = part_d[rows, order]
+    out_ids[:, :kk] = ids[part[rows, order]]
+    return out_d, out_ids
+
+
+class FlatIndex:
+    """Búsqueda exacta: una matriz contigua float32 (N, 128) y un producto matricial.
+
+    Las filas viven en un buffer con capacidad de reserva, de modo que alta,
+    reemplazo y baja son O(1) amortizado (la baja mueve la última fila al hueco).
+    No es thread-safe: FaceGallery serializa el acceso.
+    """
+
+    kind = FLAT
+
+    def __init__(self) -> None:
+        self._buffer = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self._sq_norms_buffer = np.empty((0,), dtype=np.float32)
+        self._ids_buffer = np.empty((0,), dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids_buffer[: len(self._rows)]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._buffer[: len(self._rows)]
+
+    def reset(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Reemplaza todo el contenido (carga masiva)."""
+        self._buffer = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        self._sq_norms_buffer = np.einsum("ij,ij->i", self._buffer, self._buffer)
+        self._ids_buffer = np.asarray(ids, dtype=np.int64).copy()
+        self._rows = {int(i): row for row, i in enumerate(self._ids_buffer)}
+
+    def _grow(self) -> None:
+        capacity = max(16, 2 * self._buffer.shape[0])
+        n = len(self._rows)
+        buffer = np.empty((capacity, EMBEDDING_DIM), dtype=np.float32)
+        sq_norms = np.empty((capacity,), dtype=np.float32)
+        ids = np.empty((capacity,), dtype=np.int64)
+        buffer[:n] = self._buffer[:n]
+        sq_norms[:n] = self._sq_norms_buffer[:n]
+        ids[:n] = self._ids_buffer[:n]
+        self._buffer, self._sq_norms_buffer, self._ids_buffer = buffer, sq_norms, ids
+
+    def add(self, id_: int, vector: np.ndarray) -> None:
+        """Agrega un vector o reemplaza el del mismo id."""
+        row = self._rows.get(id_)
+        if row is None:
+            row = len(self._rows)
+            if row >= self._buffer.shape[0]:
+                self._grow()
+            self._rows[id_] = row
+            self._ids_buffer[row] = id_
+        self._buffer[row] = vector
+        self._sq_norms_buffer[row] = float(vector @ vector)
+
+    def get(self, id_: int) -> Optional[np.ndarray]:
+        row = self._rows.get(id_)
+        return None if row is None else self._buffer[row].copy()
+
+    def remove(self, id_: int) -> bool:
+        row = self._rows.pop(id_, None)
+        if row is None:
+            return False
+        last = len(self._rows)
+        if row != last:
+            # Mover la última fila al hueco para mantener la matriz compacta
+            self._buffer[row] = self._buffer[last]
+            self._sq_norms_buffer[row] = self._sq_norms_buffer[last]
+            moved = int(self._ids_buffer[last])
+            self._ids_buffer[row] = moved
+            self._rows[moved] = row
+        return True
+
+    def search(self, queries: np.ndarray, k: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+        """Distancias (M, k) e ids (M, k) de los k vecinos más cercanos de cada consulta."""
+        n = len(self._rows)
+        d2 = _sq_distances(queries, self._buffer[:n], self._sq_norms_buffer[:n])
+        d2, ids = _top_k(d2, self._ids_buffer[:n], k)
+        return np.sqrt(d2), ids
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """k-means de Lloyd en NumPy puro; devuelve los centroides (k, 128)."""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    centroids = vectors[rng.choice(n, size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_to_centroids(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.stack(
+            [np.bincount(assign, weights=vectors[:, j], minlength=k) for j in range(vectors.shape[1])],
+            axis=1,
+        )
+        nonempty = counts > 0
+        centroids[nonempty] = (sums[nonempty] / counts[nonempty, None]).astype(np.float32)
+        # Listas vacías: resembrar con puntos al azar
+        empty = np.flatnonzero(~nonempty)
+        if empty.size:
+            centroids[empty] = vectors[rng.choice(n, size=empty.size, replace=False)]
+    return centroids
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(vectors.shape[0], dtype=np.intp)
+    for start in range(0, vectors.shape[0], _CHUNK):
+        block = vectors[start : start + _CHUNK]
+        out[start : start + _CHUNK] = np.argmin(_sq_distances(block, centroids, c_sq), axis=1)
+    return out
+
+
+class IVFIndex:
+    """Índice aproximado IVF (inverted file): k-means sobre la galería y una
+    FlatIndex por centroide. Cada consulta sólo recorre las `nprobe` listas
+    más cercanas, así el costo crece con N / nlist · nprobe en vez de con N.
+
+    Con menos de `min_train` vectores no se entrena y se comporta como búsqueda
+    exacta. Las altas posteriores van a la lista del centroide más cercano sin
+    reentrenar; el reentrenamiento ocurre en la próxima carga masiva (reset) si
+    la galería cambió de tamaño más de 2x. Los centroides y la asignación de
+    cada vector a su lista se guardan en `path`: al arrancar con la misma
+    galería (misma huella de ids, vectores y centroides) no se reentrena ni se
+    reasigna.
+    """
+
+    kind = IVF
+
+    def __init__(
+        self,
+        nlist: int = 0,
+        nprobe: int = 8,
+        min_train: int = 1024,
+        path: Optional[str] = None,
+        seed: int = 0,
+    ) -> None:
+        """nlist: cantidad de listas (0 = ~sqrt(N)). path: carpeta donde persistir los centroides."""
+        self.nlist = nlist
+        self.nprobe = max(1, nprobe)
+        self.min_train = min_train
+        self.path = path
+        self.seed = seed
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._lists: List[FlatIndex] = [FlatIndex()]
+        self._list_of: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._list_of)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    # --- Persistencia de los centroides y las listas --------------------------
+
+    def _files(self) -> Tuple[str, str]:
+        return os.path.join(self.path, "ivf_centroids.npy"), os.path.join(self.path, "ivf_index.json")
+
+    def _lists_files(self) -> Tuple[str, str]:
+        return os.path.join(self.path, "ivf_lists.npy"), os.path.join(self.path, "ivf_lists.json")
+
+    def _fingerprint(self, ids: np.ndarray, vectors: np.ndarray) -> str:
+        """Huella del contenido de la galería y de los centroides con que se asignó."""
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (ids, vectors, self._centroids):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def _load_assignment(self, fingerprint: str, n: int) -> Optional[np.ndarray]:
+        if not self.path:
+            return None
+        lists_file, meta_file = self._lists_files()
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") != fingerprint:
+                return None
+            assign = np.load(lists_file)
+        except (OSError, ValueError):
+            return None
+        if assign.shape != (n,) or (n and int(assign.max()) >= self._centroids.shape[0]):
+            return None
+        return assign.astype(np.intp)
+
+    def _save_assignment(self, fingerprint: str, assign: np.ndarray) -> None:
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        lists_file, meta_file = self._lists_files()
+        tmp = lists_file + ".tmp.npy"
+        np.save(tmp, assign.astype(np.int32))
+        os.replace(tmp, lists_file)
+        with open(meta_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "fingerprint": fingerprint, "size": int(assign.shape[0])}, f)
+        os.replace(meta_file + ".tmp", meta_file)
+
+    def _load_centroids(self, n: int) -> Optional[np.ndarray]:
+        if not self.path:
+            return None
+        centroids_file, meta_file = self._files()
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            centroids = np.load(centroids_file)
+        except (OSError, ValueError):
+            return None
+        trained_size = int(meta.get("trained_size", 0))
+        if self.nlist and centroids.shape[0] != self.nlist:
+            return None
+        if centroids.shape[1:] != (EMBEDDING_DIM,) or not (trained_size / 2 <= n <= trained_size * 2):
+            return None
+        self._trained_size = trained_size
+        return centroids.astype(np.float32)
+
+    def _save_centroids(self) -> None:
+        if not self.path or self._centroids is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        centroids_file, meta_file = self._files()
+        tmp = centroids_file + ".tmp.npy"
+        np.save(tmp, self._centroids)
+        os.replace(tmp, centroids_file)
+        with open(meta_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "nlist": int(self._centroids.shape[0]), "trained_size": self._trained_size}, f)
+        os.replace(meta_file + ".tmp", meta_file)
+
+    # --- Contenido -----------------------------------------------------------
+
+    def train(self, vectors: np.ndarray) -> None:
+        n = vectors.shape[0]
+        nlist = self.nlist or int(np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+        # Alcanza con una muestra de ~64 vectores por lista para ubicar los centroides
+        sample_size = min(n, nlist * 64)
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(n, size=sample_size, replace=False)] if sample_size < n else vectors
+        self._centroids = kmeans(np.ascontiguousarray(sample, dtype=np.float32), nlist, seed=self.seed)
+        self._trained_size = n
+        self._save_centroids()
+
+    def reset(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        ids = np.asarray(ids, dtype=np.int64)
+        n = vectors.shape[0]
+        self._centroids = None
+        if n >= self.min_train:
+            self._centroids = self._load_centroids(n)
+            if self._centroids is None:
+                self.train(vectors)
+        if self._centroids is None:
+            assign = np.zeros(n, dtype=np.intp)
+            n_lists = 1
+        else:
+            # Con la misma galería que en el arranque anterior, la asignación se lee de disco
+            fingerprint = self._fingerprint(ids, vectors)
+            assign = self._load_assignment(fingerprint, n)
+            if assign is None:
+                assign = assign_to_centroids(vectors, self._centroids)
+                try:
+                    self._save_assignment(fingerprint, assign)
+                except OSError as e:
+                    print(f"No se pudieron guardar las listas del índice IVF: {e}")
+            n_lists = self._centroids.shape[0]
+        # Agrupar por lista con un solo ordenamiento (en vez de recorrer assign una vez por lista)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        self._lists = []
+        for list_no in range(n_lists):
+            members = order[bounds[list_no] : bounds[list_no + 1]]
+            flat = FlatIndex()
+            flat.reset(ids[members], vectors[members])
+            self._lists.append(flat)
+        self._list_of = {int(i): int(list_no) for i, list_no in zip(ids, assign)}
+
+    def _nearest_list(self, vector: np.ndarray) -> int:
+        if self._centroids is None:
+            return 0
+        return int(assign_to_centroids(vector[None, :], self._centroids)[0])
+
+    def add(self, id_: int, vector: np.ndarray) -> None:
+        previous = self._list_of.get(id_)
+        list_no = self._nearest_list(vector)
+        if previous is not None and previous != list_no:
+            self._lists[previous].remove(id_)
+        self._lists[list_no].add(id_, vector)
+        self._list_of[id_] = list_no
+
+    def get(self, id_: int) -> Optional[np.ndarray]:
+        list_no = self._list_of.get(id_)
+        return None if list_no is None else self._lists[list_no].get(id_)
+
+    def remove(self, id_: int) -> bool:
+        list_no = self._list_of.pop(id_, None)
+        if list_no is None:
+            return False
+        return self._lists[list_no].remove(id_)
+
+    def search(self, queries: np.ndarray, k: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+        m = queries.shape[0]
+        if self._centroids is None:
+            return self._lists[0].search(queries, k)
+        nprobe = min(self.nprobe, len(self._lists))
+        coarse = _sq_distances(queries, self._centroids, np.einsum("ij,ij->i", self._centroids, self._centroids))
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe] if nprobe < len(self._lists) else None
+        best_d = np.full((m, k), np.inf, dtype=np.float32)
+        best_ids = np.full((m, k), -1, dtype=np.int64)
+        lists = np.unique(probes) if probes is not None else range(len(self._lists))
+        # Cada lista se consulta una sola vez con todas las caras que la visitan
+        for list_no in lists:
+            flat = self._lists[int(list_no)]
+            if len(flat) == 0:
+                continue
+            rows = np.flatnonzero((probes == list_no).any(axis=1)) if probes is not None else np.arange(m)
+            d, found = flat.search(queries[rows], k)
+            merged_d = np.concatenate([best_d[rows], d], axis=1)
+            merged_ids = np.concatenate([best_ids[rows], found], axis=1)
+            order = np.argsort(merged_d, axis=1)[:, :k]
+            best_d[rows] = np.take_along_axis(merged_d, order, axis=1)
+            best_ids[rows] = np.take_along_axis(merged_ids, order, axis=1)
+        return best_d, best_ids
+
+
+def build_index(
+    kind: str = FLAT,
+    path: Optional[str] = None,
+    nlist: int = 0,
+    nprobe: int = 8,
+):
+    """Índice para FaceGallery según la configuración (FACE_INDEX)."""
+    if kind == FLAT:
+        return FlatIndex()
+    if kind == IVF:
+        return IVFIndex(nlist=nlist, nprobe=nprobe, path=path)
+    raise ValueError(f"Tipo de índice inválido: {kind} (se espera '{FLAT}' o '{IVF}')")
+
+
+def stack(vectors: Sequence[np.ndarray]) -> np.ndarray:
+    if len(vectors) == 0:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    return np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
@@ -0,0 +1,133 @@
+import os
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .face_index import EMBEDDING_DIM
+from .gallery import DEFAULT_MAX_EXEMPLARS, FaceGallery
+from .recognition import encode_face
+
+# Capturas en vivo agregadas a la galería, para no perderlas al reiniciar
+HARVESTED_FILE = "harvested.npz"
+
+
+def embedding_to_bytes(encoding: np.ndarray) -> bytes:
+    """Embedding como binario compacto (128 float32 little-endian, 512 bytes) para MongoDB."""
+    return np.asarray(encoding, dtype="<f4").reshape(EMBEDDING_DIM).tobytes()
+
+
+def embedding_from_bytes(data: bytes) -> np.ndarray:
+    """Inversa de embedding_to_bytes. ValueError si el tamaño no corresponde."""
+    if len(data) != EMBEDDING_DIM * 4:
+        raise ValueError(f"Embedding inválido: {len(data)} bytes")
+    return np.frombuffer(data, dtype="<f4").astype(np.float32)
+
+
+def encode_photo(file_path: str) -> Optional[np.ndarray]:
+    """Embedding de una foto ya guardada en disco (sólo para fotos sin embedding en la base)."""
+    image = cv2.imread(file_path)
+    if image is None:
+        print(
+            f"Error al cargar la imagen: {os.path.basename(file_path)}. Verifica que sea una imagen válida."
+        )
+        return None
+    encoding = encode_face(image)
+    if encoding is None:
+        print(f"No se detectó un rostro válido en la imagen: {os.path.basename(file_path)}")
+    return encoding
+
+
+class FaceLibrary:
+    """Galería de rostros conocidos, compartida (sólo lectura) por todas las cámaras.
+
+    Los embeddings se calculan una sola vez al dar de alta cada foto y se
+    guardan en el documento de la persona; al arrancar la galería se carga de
+    MongoDB con una única consulta, sin decodificar imágenes. Cada identidad es
+    el id (ObjectId) de la persona, con todas sus fotos de alta.
+    """
+
+    def __init__(
+        self,
+        embeddings_cache_dir: str,
+        index=None,
+        max_exemplars: int = DEFAULT_MAX_EXEMPLARS,
+    ) -> None:
+        """index: índice de búsqueda de la galería (ver face_index.build_index); por defecto exacto.
+        max_exemplars: embeddings por persona (fotos más capturas en vivo)."""
+        self._harvested_path = os.path.join(embeddings_cache_dir, HARVESTED_FILE)
+        self.gallery = FaceGallery(index=index, max_exemplars=max_exemplars)
+
+    def load(self, people: Iterable[Tuple[str, Sequence[bytes]]]) -> None:
+        """Reemplaza la galería con los embeddings guardados: pares (person_id, [binarios])."""
+        encodings: List[np.ndarray] = []
+        names: List[str] = []
+        invalid = 0
+        for person_id, blobs in people:
+            for blob in blobs:
+                try:
+                    encodings.append(embedding_from_bytes(blob))
+                except ValueError:
+                    invalid += 1
+                    continue
+                names.append(person_id)
+        self.gallery.load(encodings, names)
+        harvested = self.load_harvested()
+        print(
+            f"Se cargaron {len(names)} embeddings de {len(self.gallery)} personas"
+            f" ({harvested} capturas en vivo, {invalid} inválidos, índice {self.gallery.index_kind})"
+        )
+
+    def load_harvested(self) -> int:
+        """Suma a la galería las capturas en vivo guardadas; ignora las de personas que ya no
+        están y las de quienes ya completaron el cupo con fotos de alta (cargadas después)."""
+        if not os.path.exists(self._harvested_path):
+            return 0
+        try:
+            with np.load(self._harvested_path) as data:
+                encodings, names = data["encodings"], [str(n) for n in data["names"]]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudieron leer las capturas en vivo: {e}")
+            return 0
+        added = 0
+        for encoding, name in zip(encodings, names):
+            if name in self.gallery and self.gallery.add_exemplar(
+                name, encoding, harvested=True, keep_enrolled=True
+            ):
+                added += 1
+        return added
+
+    def save_harvested(self) -> None:
+        """Guarda las capturas en vivo de la galería (escritura atómica). Nunca lanza:
+        se llama al detener cámaras y al apagar, que no deben fallar por esto."""
+        encodings, names = self.gallery.snapshot(harvested_only=True)
+        if len(encodings) == 0 and not os.path.exists(self._harvested_path):
+            return
+        try:
+            os.makedirs(os.path.dirname(self._harvested_path), exist_ok=True)
+            tmp_path = self._harvested_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    encodings=np.asarray(encodings, dtype=np.float32).reshape(-1, EMBEDDING_DIM),
+                    names=np.asarray(names, dtype=str),
+                )
+            os.replace(tmp_path, self._harvested_path)
+        except (OSError, ValueError) as e:
+            print(f"No se pudieron guardar las capturas en vivo: {e}")
+
+    def set_person(self, person_id: str, encodings: Sequence[np.ndarray]) -> None:
+        """Reemplaza en caliente las fotos de alta de una persona (sin fotos, la quita).
+        Sus capturas en vivo se descartan: pueden no parecerse a las fotos nuevas."""
+        if len(encodings) == 0:
+            self.gallery.remove(person_id)
+        else:
+            self.gallery.upsert(person_id, encodings)
+
+    def set_people(self, people: Iterable[Tuple[str, Sequence[np.ndarray]]]) -> None:
+        """Agrega o reemplaza varias personas de una vez (alta masiva); se omiten las que no tienen embeddings."""
+        self.gallery.upsert_many([(person_id, encodings) for person_id, encodings in people if len(encodings)])
+
+    def remove_person(self, person_id: str) -> bool:
+        """Quita a una persona de la galería."""
+        return self.gallery.remove(person_id)
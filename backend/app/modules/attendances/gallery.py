@@ -0,0 +1,320 @@
+import time
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .face_index import EMBEDDING_DIM, FlatIndex, stack
+
+# Misma tolerancia por defecto que face_recognition.compare_faces
+DEFAULT_TOLERANCE = 0.6
+# Embeddings individuales por persona (fotos de alta + capturas en vivo)
+DEFAULT_MAX_EXEMPLARS = 5
+
+__all__ = ["EMBEDDING_DIM", "DEFAULT_TOLERANCE", "Match", "FaceGallery", "RosterGallery"]
+
+
+class Match(NamedTuple):
+    """Resultado de buscar un embedding en la galería."""
+
+    index: int  # fila del índice del mejor candidato (-1 si la galería está vacía)
+    name: Optional[str]  # id de la persona del mejor candidato si está dentro de la tolerancia
+    distance: float  # distancia euclídea al mejor candidato
+    margin: float  # diferencia entre la segunda mejor identidad y la mejor (inf si no hay otra)
+
+    @property
+    def is_known(self) -> bool:
+        return self.name is not None
+
+
+class _Identity:
+    """Embeddings de una persona: ejemplares (los de alta primero) y su centroide."""
+
+    __slots__ = ("exemplars", "harvested", "rows", "last_harvest")
+
+    def __init__(self) -> None:
+        self.exemplars: List[np.ndarray] = []
+        self.harvested: List[bool] = []
+        self.rows: List[int] = []
+        self.last_harvest = 0.0
+
+    def vectors(self) -> List[np.ndarray]:
+        """Filas a indexar: los ejemplares y, si hay más de uno, su centroide."""
+        if len(self.exemplars) <= 1:
+            return list(self.exemplars)
+        return self.exemplars + [np.mean(self.exemplars, axis=0).astype(np.float32)]
+
+
+class FaceGallery:
+    """Galería de embeddings conocidos, por nombre de identidad.
+
+    Cada persona puede tener varios embeddings (distintas fotos y capturas de
+    alta confianza tomadas en vivo), acotados a `max_exemplars`; además se
+    indexa su centroide, que suele ser el más representativo. Así el costo de
+    emparejar crece como mucho en (max_exemplars + 1) filas por persona.
+
+    La búsqueda la resuelve un índice intercambiable (face_index.py): por
+    defecto FlatIndex, exacta, con la distancia de todos los rostros de un
+    cuadro contra toda la galería en un único producto matricial; IVFIndex
+    para galerías muy grandes. Un lock serializa las modificaciones con las
+    búsquedas del hilo de detección.
+    """
+
+    def __init__(
+        self,
+        tolerance: float = DEFAULT_TOLERANCE,
+        index=None,
+        max_exemplars: int = DEFAULT_MAX_EXEMPLARS,
+    ) -> None:
+        self.tolerance = tolerance
+        self.max_exemplars = max(1, max_exemplars)
+        self._lock = Lock()
+        self._index = index if index is not None else FlatIndex()
+        self._identities: Dict[str, _Identity] = {}
+        self._row_owner: Dict[int, str] = {}
+        self._next_row = 0
+        # Se incrementa con cada cambio; las sub-galerías lo usan para saber si quedaron viejas
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._identities)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._identities
+
+    @property
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._identities)
+
+    @property
+    def index_kind(self) -> str:
+        return self._index.kind
+
+    @property
+    def rows(self) -> int:
+        """Filas indexadas (ejemplares más centroides)."""
+        return len(self._row_owner)
+
+    # --- Alta / baja ---------------------------------------------------------
+
+    def load(self, encodings: Sequence[np.ndarray], names: Sequence[str]) -> None:
+        """Reemplaza el contenido de la galería. Un nombre puede repetirse
+        (varias fotos de la misma persona); se conservan las primeras max_exemplars."""
+        if len(encodings) != len(names):
+            raise ValueError("encodings y names deben tener la misma longitud")
+        identities: Dict[str, _Identity] = {}
+        for encoding, name in zip(encodings, names):
+            identity = identities.setdefault(name, _Identity())
+            if len(identity.exemplars) < self.max_exemplars:
+                identity.exemplars.append(np.asarray(encoding, dtype=np.float32).reshape(EMBEDDING_DIM))
+                identity.harvested.append(False)
+
+        row_ids: List[int] = []
+        vectors: List[np.ndarray] = []
+        row_owner: Dict[int, str] = {}
+        for name, identity in identities.items():
+            for vector in identity.vectors():
+                row = len(row_ids)
+                identity.rows.append(row)
+                row_owner[row] = name
+                row_ids.append(row)
+                vectors.append(vector)
+        with self._lock:
+            self._index.reset(np.asarray(row_ids, dtype=np.int64), stack(vectors))
+            self._identities = identities
+            self._row_owner = row_owner
+            self._next_row = len(row_ids)
+            self.version += 1
+
+    def _reindex(self, name: str, identity: _Identity) -> None:
+        """Reemplaza en el índice las filas de una identidad (con el lock tomado)."""
+        for row in identity.rows:
+            self._index.remove(row)
+            del self._row_owner[row]
+        identity.rows = []
+        for vector in identity.vectors():
+            row = self._next_row
+            self._next_row += 1
+            self._index.add(row, vector)
+            self._row_owner[row] = name
+            identity.rows.append(row)
+        self.version += 1
+
+    def upsert(self, name: str, encodings: Sequence[np.ndarray]) -> None:
+        """Agrega una identidad o reemplaza todos sus embeddings por éstos (las
+        fotos de alta); se descartan sus capturas en vivo."""
+        self.upsert_many([(name, encodings)])
+
+    def upsert_many(self, people: Iterable[Tuple[str, Sequence[np.ndarray]]]) -> None:
+        """Como upsert para varias identidades, tomando el lock una sola vez (alta masiva).
+        ValueError si alguna no tiene embeddings; en ese caso no se modifica ninguna."""
+        prepared = []
+        for name, encodings in people:
+            if len(encodings) == 0:
+                raise ValueError("Se necesita al menos un embedding")
+            vectors = [
+                np.asarray(encoding, dtype=np.float32).reshape(EMBEDDING_DIM)
+                for encoding in encodings[: self.max_exemplars]
+            ]
+            prepared.append((name, vectors))
+        with self._lock:
+            for name, vectors in prepared:
+                identity = self._identities.setdefault(name, _Identity())
+                identity.exemplars = vectors
+                identity.harvested = [False] * len(vectors)
+                self._reindex(name, identity)
+
+    def add_exemplar(
+        self, name: str, encoding: np.ndarray, harvested: bool = False, keep_enrolled: bool = False
+    ) -> bool:
+        """Suma un embedding a una identidad (la crea si no existe).
+        Lleno el cupo, se reemplaza la captura en vivo más vieja; si no hay
+        ninguna, el ejemplar de alta más viejo, salvo con keep_enrolled: ahí
+        no se agrega nada y devuelve False."""
+        vector = np.asarray(encoding, dtype=np.float32).reshape(EMBEDDING_DIM)
+        with self._lock:
+            identity = self._identities.setdefault(name, _Identity())
+            if len(identity.exemplars) >= self.max_exemplars:
+                if keep_enrolled and not any(identity.harvested):
+                    return False
+                victim = identity.harvested.index(True) if True in identity.harvested else 0
+                del identity.exemplars[victim]
+                del identity.harvested[victim]
+            identity.exemplars.append(vector)
+            identity.harvested.append(harvested)
+            self._reindex(name, identity)
+        return True
+
+    def harvest(
+        self,
+        name: str,
+        encoding: np.ndarray,
+        min_novelty: float,
+        min_interval: float,
+        now: Optional[float] = None,
+    ) -> bool:
+        """Agrega una captura en vivo de alta confianza si aporta variedad: debe
+        estar a más de `min_novelty` de todos los ejemplares y haber pasado
+        `min_interval` segundos desde la última de esa persona."""
+        now = time.monotonic() if now is None else now
+        vector = np.asarray(encoding, dtype=np.float32).reshape(EMBEDDING_DIM)
+        with self._lock:
+            identity = self._identities.get(name)
+            if identity is None or now - identity.last_harvest < min_interval:
+                return False
+            # Las capturas en vivo nunca desplazan a las fotos de alta
+            if len(identity.exemplars) >= self.max_exemplars and not any(identity.harvested):
+                return False
+            nearest = min(float(np.linalg.norm(e - vector)) for e in identity.exemplars)
+            if nearest < min_novelty:
+                return False
+            identity.last_harvest = now
+        # Las capturas en vivo nunca desplazan a las fotos de alta
+        return self.add_exemplar(name, vector, harvested=True, keep_enrolled=True)
+
+    def remove(self, name: str) -> bool:
+        """Quita una identidad. Devuelve False si no estaba en la galería."""
+        with self._lock:
+            identity = self._identities.pop(name, None)
+            if identity is None:
+                return False
+            for row in identity.rows:
+                self._index.remove(row)
+                del self._row_owner[row]
+            self.version += 1
+            return True
+
+    # --- Consultas -----------------------------------------------------------
+
+    def snapshot(
+        self, names: Optional[Iterable[str]] = None, harvested_only: bool = False
+    ) -> Tuple[List[np.ndarray], List[str]]:
+        """Ejemplares (no centroides) de las identidades pedidas, con el nombre
+        repetido por cada uno; sirve para armar sub-galerías o persistirlos."""
+        encodings: List[np.ndarray] = []
+        found: List[str] = []
+        with self._lock:
+            for name in list(self._identities) if names is None else names:
+                identity = self._identities.get(name)
+                if identity is None:
+                    continue
+                for exemplar, harvested in zip(identity.exemplars, identity.harvested):
+                    if harvested_only and not harvested:
+                        continue
+                    encodings.append(exemplar.copy())
+                    found.append(name)
+        return encodings, found
+
+    def match(self, encodings: Sequence[np.ndarray]) -> List[Match]:
+        """Busca la identidad más cercana de cada embedding en una sola pasada."""
+        if len(encodings) == 0:
+            return []
+        queries = stack(encodings)
+        with self._lock:
+            if not self._identities:
+                return [Match(-1, None, float("inf"), float("inf")) for _ in encodings]
+            # Suficientes filas para ver al menos dos identidades distintas
+            k = min(self.max_exemplars + 2, len(self._row_owner))
+            dists, rows = self._index.search(queries, k=k)
+            owners = [[self._row_owner.get(int(r)) for r in row] for row in rows]
+
+        results = []
+        for i in range(queries.shape[0]):
+            best_name = owners[i][0]
+            distance = float(dists[i, 0])
+            # Segunda identidad distinta; si no aparece entre las k filas, la k-ésima es una cota
+            second = float(dists[i, -1]) if k > 1 else float("inf")
+            for owner, d in zip(owners[i][1:], dists[i, 1:]):
+                if owner is not None and owner != best_name:
+                    second = float(d)
+                    break
+            if len(self._identities) == 1:
+                second = float("inf")
+            name = best_name if distance <= self.tolerance else None
+            results.append(Match(int(rows[i, 0]), name, distance, second - distance))
+        return results
+
+
+class RosterGallery:
+    """Vista de la galería restringida a las personas esperadas en una sesión
+    (p. ej. un grado y grupo).
+
+    Cada cara se busca primero en la sub-galería del roster, que es mucho más
+    chica; sólo si ahí no hay coincidencia se busca en la galería completa.
+    La sub-galería se reconstruye sola si la galería completa cambió.
+    """
+
+    def __init__(self, gallery: FaceGallery, names: Iterable[str]) -> None:
+        self._gallery = gallery
+        self.roster = list(dict.fromkeys(names))
+        self._sub = FaceGallery(tolerance=gallery.tolerance, max_exemplars=gallery.max_exemplars)
+        self._version = -1
+        self._lock = Lock()
+        self.stats = {"roster_hits": 0, "fallback_hits": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return len(self._sub)
+
+    def _refresh(self) -> None:
+        with self._lock:
+            version = self._gallery.version
+            if version == self._version:
+                return
+            encodings, names = self._gallery.snapshot(self.roster)
+            self._sub.load(encodings, names)
+            self._version = version
+
+    def match(self, encodings: Sequence[np.ndarray]) -> List[Match]:
+        if len(encodings) == 0:
+            return []
+        self._refresh()
+        results = self._sub.match(encodings)
+        misses = [i for i, match in enumerate(results) if not match.is_known]
+        self.stats["roster_hits"] += len(results) - len(misses)
+        if misses:
+            # Alguien fuera del roster (o sin foto en él): galería completa
+            for i, match in zip(misses, self._gallery.match([encodings[i] for i in misses])):
+                results[i] = match
+                self.stats["fallback_hits" if match.is_known else "misses"] += 1
+        return results
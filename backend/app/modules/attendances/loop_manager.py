@@ -1,28 +1,82 @@
-from threading import Thread, Event
-import queue
+from collections import OrderedDict
+from threading import Condition, Semaphore, Thread, Event
+from typing import Any, Dict, Hashable, Optional
 import asyncio
+import itertools
+import time
+
+from ...core.metrics import (
+    LISTENER_COALESCED,
+    LISTENER_DROPPED,
+    LISTENER_IN_FLIGHT,
+    LISTENER_QUEUE_DEPTH,
+)
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
 
 class LoopManager:
-    def __init__(self, loop_func):
+    def __init__(
+        self,
+        loop_func,
+        max_queue: int = 100,
+        policy: str = DROP_OLDEST,
+        max_concurrency: int = 4,
+        name: str = "default",
+    ):
         """
-        loop_func: función que recibe la instancia de LoopManager y se ejecuta en el hilo principal.
+        loop_func: función que se ejecuta en el hilo principal de captura.
+        max_queue: coroutines pendientes como máximo antes de aplicar la política.
+        policy: "drop_oldest" descarta la más antigua al llenarse la cola;
+            "coalesce" además reemplaza la pendiente con la misma clave.
+        max_concurrency: coroutines en vuelo a la vez en el event loop destino.
+        name: identificador de la cola en las métricas.
         """
+        if policy not in (DROP_OLDEST, COALESCE):
+            raise ValueError(f"Política de cola inválida: {policy}")
         self.loop_func = loop_func
         self.running_event = Event()
-        self.task_queue = queue.Queue()
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self._in_flight = Semaphore(max(1, max_concurrency))
+        self._pending: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._cond = Condition()
+        self._seq = itertools.count()
+        self._target_loop: Optional[asyncio.AbstractEventLoop] = None
         self._loop_thread = None
         self._worker_thread = None
+        self._m_depth = LISTENER_QUEUE_DEPTH.labels(name)
+        self._m_in_flight = LISTENER_IN_FLIGHT.labels(name)
+        self._m_dropped = LISTENER_DROPPED.labels(name)
+        self._m_coalesced = LISTENER_COALESCED.labels(name)
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "latency_ms_last": 0.0,
+            "latency_ms_max": 0.0,
+        }
 
-    def start(self):
-        """Inicia el loop principal y el worker asíncrono."""
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Inicia el loop principal y el puente asíncrono.
+        loop: event loop de la aplicación donde se ejecutarán las coroutines
+        (el de FastAPI, donde vive el cliente de Motor)."""
 
         if self.is_running():
             print("El loop ya está ejecutándose.")
             return
-        
+
+        if loop is not None:
+            self._target_loop = loop
+        if self._target_loop is None:
+            raise RuntimeError("LoopManager necesita el event loop de la aplicación")
+
         self.running_event.set()
 
-        # Arranca el hilo worker asíncrono
+        # Arranca el hilo que entrega las coroutines al event loop de la app
         if self._worker_thread is None or not self._worker_thread.is_alive():
             self._worker_thread = Thread(
                 target=self._worker_async,
@@ -43,27 +97,101 @@ class LoopManager:
     def stop(self):
         """Detiene ambos hilos."""
         self.running_event.clear()
+        with self._cond:
+            self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que termine el hilo principal (tras stop). Devuelve False si sigue vivo.
+        No espera al puente asíncrono: entrega lo pendiente al event loop, que puede ser quien llama."""
+        thread = self._loop_thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
 
     def is_running(self):
         """Devuelve True si no se ha marcado stop_event."""
         return self.running_event.is_set()
 
-    def delegar_async(self, coro_func, *args, **kwargs):
+    def delegar_async(self, coro_func, *args, key: Optional[Hashable] = None, **kwargs):
         """
-        Encola una coroutine para ser ejecutada por el worker.
+        Encola una coroutine para ser ejecutada en el event loop de la app.
         coro_func: función async (no ejecutada todavía)
+        key: con la política "coalesce", una llamada pendiente con la misma
+            clave se reemplaza por esta (sólo importa el dato más reciente).
+        Nunca bloquea al hilo que llama: si la cola está llena se descarta
+        la entrada más antigua.
         """
-        self.task_queue.put((coro_func, args, kwargs))
+        item = (coro_func, args, kwargs, time.monotonic())
+        with self._cond:
+            if self.policy == COALESCE and key is not None:
+                slot = ("key", key)
+                if slot in self._pending:
+                    self._stats["coalesced"] += 1
+                    self._m_coalesced.inc()
+                    # Conserva el tiempo de encolado original para medir la latencia real
+                    item = item[:3] + (self._pending[slot][3],)
+                    self._pending[slot] = item
+                    return
+            else:
+                slot = ("seq", next(self._seq))
+            if len(self._pending) >= self.max_queue:
+                self._pending.popitem(last=False)
+                self._stats["dropped"] += 1
+                self._m_dropped.inc()
+            self._pending[slot] = item
+            self._m_depth.set(len(self._pending))
+            self._cond.notify()
 
-    def _worker_async(self):
-        """Hilo dedicado a ejecutar coroutines en orden."""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                "queue_depth": len(self._pending),
+                "max_queue": self.max_queue,
+                "policy": self.policy,
+            }
+
+    def _on_done(self, future, enqueued_at: float):
+        self._in_flight.release()
+        self._m_in_flight.dec()
+        latency_ms = (time.monotonic() - enqueued_at) * 1000.0
+        with self._cond:
+            if future.cancelled() or future.exception() is not None:
+                self._stats["failed"] += 1
+                if not future.cancelled():
+                    print(f"Error en listener asíncrono: {future.exception()}")
+            else:
+                self._stats["completed"] += 1
+            self._stats["latency_ms_last"] = round(latency_ms, 2)
+            self._stats["latency_ms_max"] = round(max(self._stats["latency_ms_max"], latency_ms), 2)
 
-        while not self.running_event.is_set():
+    def _worker_async(self):
+        """Hilo que entrega las coroutines encoladas al event loop de la app,
+        respetando el límite de concurrencia. Al detenerse entrega lo pendiente."""
+        while self.running_event.is_set() or self._pending:
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait(0.5)
+                    continue
+            # Esperar lugar antes de sacar el item: mientras tanto la cola puede seguir coalesciendo
+            if not self._in_flight.acquire(timeout=0.5):
+                continue
+            with self._cond:
+                if not self._pending:
+                    self._in_flight.release()
+                    continue
+                _, (func, args, kwargs, enqueued_at) = self._pending.popitem(last=False)
+                self._stats["submitted"] += 1
+                self._m_depth.set(len(self._pending))
+            self._m_in_flight.inc()
             try:
-                func, args, kwargs = self.task_queue.get(timeout=0.5)
-            except queue.Empty:
+                future = asyncio.run_coroutine_threadsafe(func(*args, **kwargs), self._target_loop)
+            except Exception as e:
+                self._in_flight.release()
+                self._m_in_flight.dec()
+                with self._cond:
+                    self._stats["failed"] += 1
+                print(f"No se pudo enviar el listener al event loop: {e}")
                 continue
-            loop.run_until_complete(func(*args, **kwargs))
-            self.task_queue.task_done()
\ No newline at end of file
+            future.add_done_callback(lambda f, t=enqueued_at: self._on_done(f, t))
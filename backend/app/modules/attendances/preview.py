@@ -0,0 +1,107 @@
+import asyncio
+import time
+from threading import Lock
+from typing import AsyncIterator, Dict, List, Optional
+
+import cv2
+
+
+class PreviewClient:
+    """Un espectador remoto con su propio límite de cuadros por segundo."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_fps: float) -> None:
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.last_seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+
+class FrameBroadcaster:
+    """Viewer que codifica cada cuadro anotado a JPEG una sola vez y lo reparte.
+
+    Se conecta al detector sólo mientras haya clientes, así sin espectadores
+    no se dibuja ni se codifica nada. Cada cliente lee siempre el último JPEG:
+    si es lento (red o límite de fps) se saltea cuadros en vez de frenar la
+    captura.
+    """
+
+    def __init__(self, detector, jpeg_quality: int = 80) -> None:
+        self._detector = detector
+        self._params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self._lock = Lock()
+        self._clients: List[PreviewClient] = []
+        self._jpeg: Optional[bytes] = None
+        self._seq = 0
+        self.encoded = 0
+
+    # --- Lado del hilo de dibujo ------------------------------------------
+
+    def show(self, frame) -> None:
+        clients = self._clients
+        if not clients:
+            return
+        ok, buffer = cv2.imencode(".jpg", frame, self._params)
+        if not ok:
+            return
+        with self._lock:
+            self._jpeg = buffer.tobytes()
+            self._seq += 1
+            self.encoded += 1
+        for client in clients:
+            client.loop.call_soon_threadsafe(client.event.set)
+
+    def close(self) -> None:
+        # Los clientes siguen conectados esperando a que la captura se reanude
+        pass
+
+    # --- Lado del event loop ----------------------------------------------
+
+    def _register(self, client: PreviewClient) -> None:
+        with self._lock:
+            first = not self._clients
+            self._clients = self._clients + [client]
+        if first:
+            self._detector.attach_viewer(self)
+
+    def _unregister(self, client: PreviewClient) -> None:
+        with self._lock:
+            self._clients = [c for c in self._clients if c is not client]
+            empty = not self._clients
+        if empty:
+            self._detector.detach_viewer(self)
+
+    async def frames(self, max_fps: float) -> AsyncIterator[bytes]:
+        """Genera JPEGs para un cliente respetando su límite de fps."""
+        client = PreviewClient(asyncio.get_running_loop(), max_fps)
+        self._register(client)
+        try:
+            last_sent_at = 0.0
+            while True:
+                await client.event.wait()
+                client.event.clear()
+                wait = client.min_interval - (time.monotonic() - last_sent_at)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                with self._lock:
+                    jpeg, seq = self._jpeg, self._seq
+                if jpeg is None or seq == client.last_seq:
+                    continue
+                if client.last_seq:
+                    client.dropped += seq - client.last_seq - 1
+                client.last_seq = seq
+                last_sent_at = time.monotonic()
+                client.sent += 1
+                yield jpeg
+        finally:
+            self._unregister(client)
+
+    def stats(self) -> Dict[str, object]:
+        clients = self._clients
+        return {
+            "clients": len(clients),
+            "encoded": self.encoded,
+            "sent": [c.sent for c in clients],
+            "dropped": [c.dropped for c in clients],
+        }
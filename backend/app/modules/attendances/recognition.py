@@ -0,0 +1,252 @@
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from threading import Condition, Lock, local
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from ...utils.models import models
+
+# Tamaño al que se reduce cada rostro antes de calcular el embedding
+FACE_SIZE = 150
+SLOT_SHAPE = (FACE_SIZE, FACE_SIZE, 3)
+SLOT_BYTES = FACE_SIZE * FACE_SIZE * 3
+
+
+def prepare_face(image: np.ndarray) -> np.ndarray:
+    """Recorte BGR -> RGB 150x150 uint8 contiguo, listo para dlib."""
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image_rgb_small = cv2.resize(image_rgb, (FACE_SIZE, FACE_SIZE))
+    # Asegurar uint8 y contigüidad en memoria (evita errores en Windows/dlib)
+    return np.ascontiguousarray(image_rgb_small, dtype=np.uint8)
+
+
+def prepare_face_into(image: np.ndarray, out: np.ndarray) -> None:
+    """Como prepare_face, pero escribe directo en un slot 150x150x3 ya reservado (sin copias intermedias)."""
+    cv2.resize(image, (FACE_SIZE, FACE_SIZE), dst=out)
+    cv2.cvtColor(out, cv2.COLOR_BGR2RGB, dst=out)
+
+
+def encode_prepared(face_rgb: np.ndarray, num_jitters: int = 1) -> Optional[np.ndarray]:
+    """Embedding de un rostro ya preparado con prepare_face (el rostro ocupa todo el recorte)."""
+    return models.encoder().encode_one(face_rgb, num_jitters)
+
+
+def encode_batch(faces_rgb: np.ndarray, num_jitters: int = 1) -> List[Optional[np.ndarray]]:
+    """Embeddings de varios rostros preparados (N, 150, 150, 3) en una sola pasada.
+
+    Los landmarks se calculan por rostro (son baratos), pero la red de dlib
+    recibe todos los recortes juntos en un único lote, así el costo fijo de
+    cada llamada se paga una vez por lote y no una vez por cara. Si la versión
+    de dlib no admite lotes, se codifica de a uno.
+    """
+    n = len(faces_rgb)
+    if n == 0:
+        return []
+    images = [faces_rgb[i] for i in range(n)]
+    try:
+        return list(models.encoder().encode(images, num_jitters))
+    except Exception as e:
+        if n > 1:
+            print(f"No se pudo codificar el lote, se codifica de a uno: {e}")
+        results: List[Optional[np.ndarray]] = []
+        for image in images:
+            try:
+                results.append(encode_prepared(np.ascontiguousarray(image), num_jitters))
+            except Exception as e:
+                print(f"Error al obtener encodings: {e}")
+                results.append(None)
+        return results
+
+
+def encode_face(image: np.ndarray, num_jitters: int = 1) -> Optional[np.ndarray]:
+    """Obtiene el embedding de un recorte BGR que contiene un único rostro."""
+    try:
+        return encode_prepared(prepare_face(image), num_jitters)
+    except Exception as e:
+        print(f"Error al obtener encodings: {e}")
+        return None
+
+
+# Estado de cada proceso worker (se inicializa una sola vez por proceso)
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_slots: Optional[np.ndarray] = None
+
+
+def _init_worker(shm_name: str, n_slots: int) -> None:
+    """Adjunta la memoria compartida de recortes y carga los modelos de dlib, una vez por proceso."""
+    global _worker_shm, _worker_slots
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_slots = np.ndarray((n_slots, *SLOT_SHAPE), dtype=np.uint8, buffer=_worker_shm.buf)
+    models.encoder()
+
+
+def _encode_slots(slots: List[int]) -> List[Optional[np.ndarray]]:
+    """Codifica en un solo lote los rostros de los slots indicados."""
+    return encode_batch(_worker_slots[slots])
+
+
+class RecognitionPool:
+    """Pool de codificación compartido por todas las cámaras.
+
+    Con workers > 0 los embeddings se calculan en procesos aparte (fuera del
+    GIL). Los recortes viajan por un bloque de memoria compartida dividido en
+    slots de 150x150x3; a cada tarea sólo se le pasan los números de slot. Con
+    workers == 0 se codifica en el hilo que llama, sobre un buffer reservado
+    por hilo.
+
+    Las caras de un cuadro se codifican en lotes (encode_batch): con workers,
+    se reparten en a lo sumo un lote por worker.
+
+    Tras shutdown() el pool queda cerrado: encode devuelve None para cada
+    recorte y nunca vuelve a crear memoria compartida ni procesos.
+    """
+
+    def __init__(self, workers: int = 0, slots_per_worker: int = 8) -> None:
+        self._workers = max(0, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._slots: Optional[np.ndarray] = None
+        self._lock = Lock()
+        # shutdown espera a que terminen los lotes en curso antes de liberar la memoria compartida
+        self._idle = Condition(self._lock)
+        self._in_flight = 0
+        self._closed = False
+        self._alloc_lock = Lock()
+        self._n_slots = self._workers * slots_per_worker
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        # Buffer de recortes de cada hilo que codifica sin workers (crece según haga falta)
+        self._local = local()
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def _acquire(self) -> Optional[Tuple[ProcessPoolExecutor, np.ndarray, "queue.Queue[int]"]]:
+        """Registra un encode en curso y devuelve (executor, slots, cola de slots libres);
+        None si el pool ya se cerró. Cada encode usa los slots con que empezó."""
+        with self._lock:
+            if self._closed:
+                return None
+            executor = self._ensure_started()
+            self._in_flight += 1
+            return executor, self._slots, self._free_slots
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._idle.notify_all()
+
+    def _ensure_started(self) -> ProcessPoolExecutor:
+        """Crea la memoria compartida y los procesos en el primer uso (con el lock tomado)."""
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=self._n_slots * SLOT_BYTES
+            )
+            self._slots = np.ndarray(
+                (self._n_slots, *SLOT_SHAPE), dtype=np.uint8, buffer=self._shm.buf
+            )
+            self._free_slots = queue.Queue()
+            for slot in range(self._n_slots):
+                self._free_slots.put(slot)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._shm.name, self._n_slots),
+            )
+        return self._executor
+
+    def encode(self, rois: Sequence[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Codifica los recortes de un cuadro; el resultado respeta el orden de entrada."""
+        if len(rois) == 0:
+            return []
+        if self._closed:
+            return [None] * len(rois)
+        if self._workers == 0:
+            return self._encode_local(rois)
+
+        acquired = self._acquire()
+        if acquired is None:
+            return [None] * len(rois)
+        try:
+            results: List[Optional[np.ndarray]] = []
+            # Lotes de a lo sumo n_slots recortes para no quedarnos sin lugares
+            for start in range(0, len(rois), self._n_slots):
+                results.extend(self._encode_chunk(*acquired, rois[start : start + self._n_slots]))
+            return results
+        finally:
+            self._release()
+
+    def _encode_local(self, rois: Sequence[np.ndarray]) -> List[Optional[np.ndarray]]:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < len(rois):
+            buffer = np.empty((max(8, len(rois)), *SLOT_SHAPE), dtype=np.uint8)
+            self._local.buffer = buffer
+        for i, roi in enumerate(rois):
+            prepare_face_into(roi, buffer[i])
+        return encode_batch(buffer[: len(rois)])
+
+    def _encode_chunk(
+        self,
+        executor: ProcessPoolExecutor,
+        slot_buffers: np.ndarray,
+        free_slots: "queue.Queue[int]",
+        rois: Sequence[np.ndarray],
+    ) -> List[Optional[np.ndarray]]:
+        # Reservar todos los slots del lote de una vez (evita interbloqueos entre cámaras)
+        with self._alloc_lock:
+            slots = [free_slots.get() for _ in rois]
+        try:
+            for slot, roi in zip(slots, rois):
+                prepare_face_into(roi, slot_buffers[slot])
+            # Un lote por worker como máximo: más caras por lote abaratan cada una
+            n_batches = min(self._workers, len(slots))
+            size = -(-len(slots) // n_batches)
+            batches = [slots[start : start + size] for start in range(0, len(slots), size)]
+            try:
+                futures = [executor.submit(_encode_slots, batch) for batch in batches]
+            except RuntimeError as e:
+                # BrokenProcessPool, o un executor que otro hilo ya cerró
+                print(f"Worker de reconocimiento caído: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    self._discard_executor(executor)
+                return [None] * len(slots)
+            results: List[Optional[np.ndarray]] = []
+            for batch, future in zip(batches, futures):
+                try:
+                    results.extend(future.result())
+                except BrokenProcessPool as e:
+                    print(f"Worker de reconocimiento caído: {e}")
+                    results.extend([None] * len(batch))
+                    self._discard_executor(executor)
+            return results
+        finally:
+            for slot in slots:
+                free_slots.put(slot)
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Descarta un pool roto; el próximo encode levanta procesos nuevos."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Cierra el pool para siempre; espera (hasta timeout) los encode en curso."""
+        with self._lock:
+            self._closed = True
+            self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._shm is not None:
+                self._slots = None
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
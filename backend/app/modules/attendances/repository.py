@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+from datetime import date, datetime, time, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
 
 COLLECTION = "attendances"
 
@@ -57,14 +58,12 @@ async def create_attendance(
     db: AsyncIOMotorDatabase,
     person_id: str,
 ) -> Dict[str, Any]:
-    """Registra la asistencia de una persona. Si ya existe una asistencia para esa persona en el día actual, no se registra de nuevo."""
-    # TODO: Se requiere algún tipo de cache ya que se llama con mucha frecuencia
-    # como una lista limitada a 10, cuando llega a 10 se elimina el más antiguo (FIFO)
-    # de esa forma los mas frecuentes estarán en cache y no se consultará a la base de datos
+    """Registra la asistencia de una persona. Si ya existe una asistencia para esa persona en el día actual, no se registra de nuevo.
+    Para el flujo de detección usar AttendanceWriter (writer.py), que cachea y escribe por lotes."""
     found_person_in_date = await db[COLLECTION].find_one(
         {
             "person_id": person_id,
-            "assistance_time": {
+            "attendance_time": {
                 "$gte": datetime.now(timezone.utc).replace(
                     hour=0, minute=0, second=0, microsecond=0
                 )
@@ -86,6 +85,54 @@ async def create_attendance(
     return _serialize(created)
 
 
+def _day_range(day: date) -> Dict[str, datetime]:
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return {"$gte": start, "$lt": start + timedelta(days=1)}
+
+
+async def has_attendance_on_day(
+    db: AsyncIOMotorDatabase,
+    person_id: str,
+    day: date,
+) -> bool:
+    found = await db[COLLECTION].find_one(
+        {"person_id": person_id, "attendance_time": _day_range(day)},
+        projection={"_id": 1},
+    )
+    return found is not None
+
+
+async def list_person_ids_on_day(
+    db: AsyncIOMotorDatabase,
+    day: date,
+    limit: int,
+) -> List[str]:
+    person_ids = await db[COLLECTION].distinct(
+        "person_id", {"attendance_time": _day_range(day)}
+    )
+    return person_ids[:limit]
+
+
+async def insert_attendances(
+    db: AsyncIOMotorDatabase,
+    documents: List[Dict[str, Any]],
+) -> int:
+    """Inserta un lote de asistencias. Los duplicados (misma persona y día) se ignoran,
+    así reintentar un lote ya escrito en parte es seguro."""
+    if not documents:
+        return 0
+    # insert_many agrega _id a los dicts; se copian para poder reintentar el lote
+    docs = [{k: v for k, v in d.items() if k != "_id"} for d in documents]
+    try:
+        result = await db[COLLECTION].insert_many(docs, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        return e.details.get("nInserted", 0)
+
+
 async def remove_attendance(
     db: AsyncIOMotorDatabase,
     attendance_id: str,
@@ -8,10 +8,14 @@ from fastapi import (
     Query,
     Request,
     Response,
+    WebSocket,
+    WebSocketDisconnect,
 )
+from fastapi.responses import StreamingResponse
 
 from . import service
 from .schema import AttendanceOut
+from ...core.config import settings
 
 
 
@@ -27,11 +31,26 @@ def get_db(request: Request):
     response_model=Any,
     status_code=201,
     summary="Detección facial",
-    description="Inicia el proceso de detección facial, abre la ventana de la cámara.",
+    description=(
+        "Inicia el proceso de detección facial en una cámara. Abre la ventana de la cámara salvo en modo HEADLESS. "
+        "Con grade, group o person_ids las caras se buscan primero entre las personas esperadas "
+        "y sólo si no coinciden con nadie, en toda la galería."
+    ),
 )
-async def start_registration(request: Request):
+async def start_registration(
+    request: Request,
+    device_id: str = Query(settings.DEVICE_ID, description="Id de la cámara"),
+    grade: Optional[str] = Query(None, description="Roster: grado/curso esperado"),
+    group: Optional[str] = Query(None, description="Roster: división/grupo esperado"),
+    person_ids: Optional[List[str]] = Query(None, description="Roster: ids de las personas esperadas"),
+):
     db = get_db(request)
-    await service.start_registration(db)
+    try:
+        await service.start_registration(db, device_id, grade=grade, group=group, person_ids=person_ids)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return Response(status_code=200)
 
 
@@ -40,12 +59,96 @@ async def start_registration(request: Request):
     response_model=Any,
     status_code=201,
     summary="Finaliza detección facial",
-    description=("Finaliza el proceso de detección facial, cierra la ventana."),
+    description=("Finaliza el proceso de detección facial en una cámara y cierra su ventana si la hay."),
 )
-async def stop_registration():
-    await service.stop_registration()
+async def stop_registration(
+    device_id: str = Query(settings.DEVICE_ID, description="Id de la cámara"),
+):
+    try:
+        await service.stop_registration(device_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
     return Response(status_code=200)
 
+
+@router.get(
+    "/devices",
+    response_model=Any,
+    summary="Listar cámaras",
+    description="Retorna las cámaras configuradas y si la detección está activa en cada una.",
+)
+async def list_devices():
+    return service.list_devices()
+
+@router.get(
+    "/pipeline",
+    response_model=Any,
+    summary="Estado del pipeline de video",
+    description="Profundidad de cola, cuadros recibidos, procesados y descartados por etapa (captura, reconocimiento, dibujo).",
+)
+async def pipeline_stats(
+    device_id: str = Query(settings.DEVICE_ID, description="Id de la cámara"),
+):
+    try:
+        return service.pipeline_stats(device_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+
+
+async def _mjpeg(frames):
+    async for jpeg in frames:
+        yield (
+            b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+            + str(len(jpeg)).encode()
+            + b"\r\n\r\n"
+            + jpeg
+            + b"\r\n"
+        )
+
+
+@router.get(
+    "/preview",
+    summary="Vista previa MJPEG",
+    description=(
+        "Transmite el video anotado de una cámara como MJPEG (multipart/x-mixed-replace), "
+        "apto para un <img src>. Cada cuadro se codifica una sola vez para todos los espectadores; "
+        "un cliente lento se saltea cuadros en lugar de frenar la captura."
+    ),
+)
+async def preview_mjpeg(
+    device_id: str = Query(settings.DEVICE_ID, description="Id de la cámara"),
+    fps: float = Query(settings.PREVIEW_MAX_FPS, gt=0, le=60, description="Cuadros por segundo máximos para este cliente"),
+):
+    try:
+        broadcaster = service.get_broadcaster(device_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+    return StreamingResponse(
+        _mjpeg(broadcaster.frames(fps)),
+        media_type="multipart/x-mixed-replace; boundary=frame",
+    )
+
+
+@router.websocket("/preview/ws")
+async def preview_ws(
+    websocket: WebSocket,
+    device_id: str = Query(settings.DEVICE_ID),
+    fps: float = Query(settings.PREVIEW_MAX_FPS, gt=0, le=60),
+):
+    """Vista previa por WebSocket: cada mensaje binario es un JPEG."""
+    try:
+        broadcaster = service.get_broadcaster(device_id)
+    except KeyError:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    try:
+        async for jpeg in broadcaster.frames(fps):
+            await websocket.send_bytes(jpeg)
+    except WebSocketDisconnect:
+        pass
+
+
 @router.get(
     "/",
     response_model=List[AttendanceOut],
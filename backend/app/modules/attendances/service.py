@@ -1,11 +1,51 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+from typing import Any, Dict, List, Optional
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from . import repository as repo
-from .face_detector import face_detector
+from .devices import devices, face_library
+from .events import LEFT, PresenceEvent
+from .preview import FrameBroadcaster
+from .writer import AttendanceWriter
+from ..people import repository as people_repo
+from ...core.config import settings
+
+_writer: Optional[AttendanceWriter] = None
+# Un broadcaster de vista previa por cámara, creado al conectarse el primer espectador
+_broadcasters: Dict[str, FrameBroadcaster] = {}
+# Cámaras que ya tienen registrado el listener de asistencia (evita duplicarlo al reiniciar)
+_listening_devices = set()
+
+
+async def startup(db: AsyncIOMotorDatabase) -> None:
+    """Carga la galería desde las personas, crea el writer de asistencias,
+    recupera el journal y arranca el flush periódico."""
+    face_library.load(await people_repo.list_face_embeddings(db))
+    writer = _get_writer(db)
+    await writer.recover()
+    await writer.warm_up()
+    writer.start()
+
+
+async def shutdown() -> None:
+    # Primero las asistencias pendientes: no dependen de que se guarden las capturas
+    if _writer is not None:
+        await _writer.close()
+    face_library.save_harvested()
+
+
+def _get_writer(db: AsyncIOMotorDatabase) -> AttendanceWriter:
+    global _writer
+    if _writer is None:
+        _writer = AttendanceWriter(
+            db,
+            journal_path=settings.ATTENDANCE_JOURNAL_PATH,
+            debounce_seconds=settings.DEBOUNCE_SECONDS,
+        )
+    return _writer
 
 
 async def list_attendances(
@@ -27,19 +67,77 @@ async def list_attendances(
     return items
 
 
-async def start_registration(db: AsyncIOMotorDatabase):
-    async def _marcar_asistencia(faces: List[Tuple[int, int, int, int, str, str]]):
-        for face in faces:
-            X, Y, W, H, name, color = face
-            # TODO: debe ser el id de la persona, no el nombre
-            await repo.create_attendance(db, name)
+async def resolve_roster(
+    db: AsyncIOMotorDatabase,
+    grade: Optional[str] = None,
+    group: Optional[str] = None,
+    person_ids: Optional[List[str]] = None,
+) -> Optional[List[str]]:
+    """Ids de las personas esperadas en la sesión; None si no hay filtro.
+    ValueError si algún id de persona es inválido."""
+    if not (grade or group or person_ids):
+        return None
+    return await people_repo.list_person_ids(db, grade=grade, group=group, person_ids=person_ids)
+
+
+async def start_registration(
+    db: AsyncIOMotorDatabase,
+    device_id: str,
+    grade: Optional[str] = None,
+    group: Optional[str] = None,
+    person_ids: Optional[List[str]] = None,
+):
+    """Inicia la detección en una cámara. KeyError si el dispositivo no existe.
+    grade/group/person_ids: roster esperado; se busca primero entre esas personas."""
+    face_detector = devices.get(device_id)
+    writer = _get_writer(db)
+    face_detector.set_roster(await resolve_roster(db, grade, group, person_ids))
+
+    async def _marcar_asistencia(events: List[PresenceEvent]):
+        for event in events:
+            if event.kind == LEFT:
+                continue
+            # Las identidades de la galería son los ids de las personas
+            await writer.mark(event.name)
+
+    if device_id not in _listening_devices:
+        face_detector.on_presence_events(lambda events: _marcar_asistencia(events))
+        _listening_devices.add(device_id)
+    face_detector.start_detection(asyncio.get_running_loop())
+
+
+async def stop_registration(device_id: str):
+    """Finaliza la detección en una cámara. KeyError si el dispositivo no existe."""
+    devices.get(device_id).stop_detection()
+    if _writer is not None:
+        await _writer.flush()
+    # Persistir las capturas en vivo de la sesión
+    face_library.save_harvested()
+
+
+def list_devices() -> List[Dict[str, Any]]:
+    return [
+        {"device_id": detector.device_id, "is_running": detector.is_running}
+        for detector in devices.all()
+    ]
+
 
-    face_detector.on_detected_faces(lambda faces: _marcar_asistencia(faces))
-    face_detector.start_detection()
+def pipeline_stats(device_id: str) -> Dict[str, Any]:
+    stats = devices.get(device_id).pipeline_stats()
+    if device_id in _broadcasters:
+        stats["preview"] = _broadcasters[device_id].stats()
+    return stats
 
 
-async def stop_registration():
-    face_detector.stop_detection()
+def get_broadcaster(device_id: str) -> FrameBroadcaster:
+    """Broadcaster de vista previa de una cámara. KeyError si el dispositivo no existe."""
+    broadcaster = _broadcasters.get(device_id)
+    if broadcaster is None:
+        broadcaster = FrameBroadcaster(
+            devices.get(device_id), jpeg_quality=settings.PREVIEW_JPEG_QUALITY
+        )
+        _broadcasters[device_id] = broadcaster
+    return broadcaster
 
 
 async def remove_attendance(db: AsyncIOMotorDatabase, attendance_id: str):
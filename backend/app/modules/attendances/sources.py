@@ -0,0 +1,106 @@
+import queue
+from threading import Event, Thread
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+import cv2
+
+_END = object()
+
+
+class DecodedFrame(NamedTuple):
+    index: int  # número de cuadro en el archivo (desde 0)
+    timestamp: float  # segundos desde el inicio del video
+    frame: Any
+
+
+class FileSource:
+    """Lee un archivo de video en su propio hilo, sin ritmo de tiempo real.
+
+    A diferencia de la cámara, acá no se descartan cuadros: la cola es
+    bloqueante, así que el decodificador espera al consumidor. Con
+    `every_seconds` sólo se decodifica (retrieve) un cuadro por intervalo;
+    el resto sólo se avanza con grab(), que es mucho más barato.
+    """
+
+    def __init__(self, path: str, every_seconds: float = 0.0, queue_size: int = 8) -> None:
+        self.path = path
+        self.every_seconds = max(0.0, every_seconds)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        self._error: Optional[BaseException] = None
+        self.fps = 0.0
+        self.frames_read = 0
+        self.frames_decoded = 0
+
+    def _timestamp(self, cap: cv2.VideoCapture, index: int) -> float:
+        msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if msec > 0:
+            return msec / 1000.0
+        # Algunos contenedores no informan la posición: estimar con los fps
+        return index / self.fps if self.fps > 0 else float(index)
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self) -> None:
+        cap = cv2.VideoCapture(self.path)
+        try:
+            if not cap.isOpened():
+                raise RuntimeError(f"No se pudo abrir el video: {self.path}")
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            next_due = 0.0
+            index = -1
+            while not self._stop.is_set():
+                if not cap.grab():
+                    break
+                index += 1
+                self.frames_read += 1
+                timestamp = self._timestamp(cap, index)
+                if timestamp + 1e-6 < next_due:
+                    continue
+                ok, frame = cap.retrieve()
+                if not ok:
+                    continue
+                self.frames_decoded += 1
+                next_due = timestamp + self.every_seconds
+                if not self._put(DecodedFrame(index, timestamp, frame)):
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            cap.release()
+            self._put(_END)
+
+    def __iter__(self) -> Iterator[DecodedFrame]:
+        self._thread = Thread(target=self._decode, daemon=True, name="FileSource")
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            self.close()
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fps": round(self.fps, 2),
+            "frames_read": self.frames_read,
+            "frames_decoded": self.frames_decoded,
+        }
@@ -0,0 +1,118 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Box = Tuple[int, int, int, int]  # (X, Y, W, H)
+
+
+def iou(a: Box, b: Box) -> float:
+    """Intersección sobre unión de dos cajas (X, Y, W, H)."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """Un rostro seguido a lo largo de varios cuadros."""
+
+    def __init__(self, track_id: int, box: Box) -> None:
+        self.track_id = track_id
+        self.box = box
+        self.name: Optional[str] = None
+        self.distance = float("inf")
+        self.confidence = 0.0  # 0 = hay que (re)codificar
+        self.misses = 0
+        self.encodings = 0
+
+    @property
+    def needs_encoding(self) -> bool:
+        return self.confidence <= 0.0
+
+    def __repr__(self) -> str:
+        return f"Track({self.track_id}, {self.box}, {self.name}, conf={self.confidence:.2f})"
+
+
+class IoUTracker:
+    """Asociación por IoU entre las cajas de cuadros consecutivos procesados.
+
+    La identidad se conserva en la pista y sólo se vuelve a calcular el
+    embedding cuando la pista es nueva o su confianza decae por debajo del
+    umbral (la confianza baja en cada cuadro y más rápido si es desconocida).
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        max_misses: int = 3,
+        decay: float = 0.95,
+        min_confidence: float = 0.3,
+        known_confidence: float = 1.0,
+        unknown_confidence: float = 0.6,
+    ) -> None:
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.decay = decay
+        self.min_confidence = min_confidence
+        self.known_confidence = known_confidence
+        self.unknown_confidence = unknown_confidence
+        self._tracks: Dict[int, Track] = {}
+        self._next_id = 1
+
+    @property
+    def tracks(self) -> List[Track]:
+        return list(self._tracks.values())
+
+    def reset(self) -> None:
+        self._tracks.clear()
+
+    def update(self, boxes: Sequence[Box]) -> List[Track]:
+        """Asocia las cajas del cuadro a pistas existentes (greedy por IoU) o crea nuevas.
+        Devuelve una pista por caja, en el mismo orden."""
+        pairs = []
+        for ti, track in self._tracks.items():
+            for bi, box in enumerate(boxes):
+                score = iou(track.box, box)
+                if score >= self.iou_threshold:
+                    pairs.append((score, ti, bi))
+        pairs.sort(reverse=True)
+
+        assigned: Dict[int, Track] = {}
+        used_tracks = set()
+        for _, ti, bi in pairs:
+            if ti in used_tracks or bi in assigned:
+                continue
+            used_tracks.add(ti)
+            track = self._tracks[ti]
+            track.box = boxes[bi]
+            track.misses = 0
+            track.confidence *= self.decay
+            if track.confidence < self.min_confidence:
+                track.confidence = 0.0
+            assigned[bi] = track
+
+        # Pistas sin caja en este cuadro: se descartan tras max_misses cuadros
+        for ti in list(self._tracks):
+            if ti not in used_tracks:
+                track = self._tracks[ti]
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    del self._tracks[ti]
+
+        result = []
+        for bi, box in enumerate(boxes):
+            track = assigned.get(bi)
+            if track is None:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+                self._tracks[track.track_id] = track
+            result.append(track)
+        return result
+
+    def set_identity(self, track: Track, name: Optional[str], distance: float) -> None:
+        """Registra el resultado de codificar y emparejar una pista."""
+        track.name = name
+        track.distance = distance
+        track.encodings += 1
+        track.confidence = self.known_confidence if name else self.unknown_confidence
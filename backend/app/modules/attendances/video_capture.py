@@ -1,19 +1,250 @@
+import os
 import platform
+import time
+from collections import deque
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Union
+
 import cv2
 
+from ...core.metrics import FRAMES_CAPTURED, FRAMES_DROPPED, STAGE_SECONDS
+
+
+class LatestFrameSlot:
+    """Buffer acotado (por defecto de un solo lugar) que descarta los cuadros viejos.
+
+    El productor nunca se bloquea: si el consumidor no alcanzó a leer, el
+    cuadro más antiguo se pisa y se cuenta como descartado.
+    """
+
+    def __init__(self, capacity: int = 1) -> None:
+        self._items: deque = deque(maxlen=capacity)
+        self._cond = Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item: Any) -> bool:
+        """Devuelve True si para hacer lugar se descartó un cuadro pendiente."""
+        with self._cond:
+            dropped = len(self._items) == self._items.maxlen
+            if dropped:
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+        return dropped
+
+    def get(self, timeout: float = 0.5) -> Optional[Any]:
+        """Devuelve el cuadro más antiguo pendiente o None si no llegó ninguno a tiempo."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self) -> None:
+        with self._cond:
+            self._items.clear()
+            self._closed = False
+
+    @property
+    def capacity(self) -> int:
+        return self._items.maxlen
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class FrameStage:
+    """Etapa del pipeline: consume cuadros de su propio slot en un hilo, a su ritmo."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], None],
+        every_n: int = 1,
+        capacity: int = 1,
+        active: Optional[Callable[[], bool]] = None,
+        drop_counter=None,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.every_n = max(1, every_n)
+        # Si se indica, la etapa sólo recibe cuadros mientras active() sea True
+        self.active = active
+        self.slot = LatestFrameSlot(capacity)
+        # Serie de métricas (con .inc()) para los cuadros descartados
+        self._drop_counter = drop_counter
+        self.processed = 0
+        self.errors = 0
+        self._thread: Optional[Thread] = None
+
+    def offer(self, frame_index: int, frame) -> None:
+        if self.active is not None and not self.active():
+            return
+        if frame_index % self.every_n == 0:
+            if self.slot.put(frame) and self._drop_counter is not None:
+                self._drop_counter.inc()
+
+    def _run(self) -> None:
+        while not self.slot.closed:
+            frame = self.slot.get()
+            if frame is None:
+                continue
+            try:
+                self.handler(frame)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error en la etapa '{self.name}': {e}")
+            self.processed += 1
+
+    def start(self) -> None:
+        self.slot.reopen()
+        self._thread = Thread(target=self._run, daemon=True, name=f"Stage-{self.name}")
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self.slot.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self.slot),
+            "capacity": self.slot.capacity,
+            "received": self.slot.put_count,
+            "dropped": self.slot.dropped,
+            "processed": self.processed,
+            "errors": self.errors,
+        }
+
+
+class LatestFrameGrabber:
+    """Lee un stream de red siempre desde el cuadro más nuevo.
+
+    Un hilo llama a grab() sin parar, lo que vacía el buffer del decodificador
+    (sin acumular latencia); retrieve() sólo se hace cuando el consumidor pide
+    un cuadro. Los cuadros tomados y nunca recuperados cuentan como descartados.
+    pace_fps > 0 limita el ritmo de grab(): sirve para que un archivo local se
+    comporte como una cámara en vivo.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, pace_fps: float = 0.0) -> None:
+        self._cap = cap
+        self._pace = 1.0 / pace_fps if pace_fps > 0 else 0.0
+        self._lock = Lock()
+        self._cond = Condition()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        self._seq = 0
+        self._read_seq = 0
+        self.failed = False
+        self.last_grab_at = time.monotonic()
+        self.grabbed = 0
+        self.retrieved = 0
+        self.dropped = 0
+
+    def _run(self) -> None:
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            if self._pace:
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_at = max(next_at + self._pace, time.monotonic() - self._pace)
+            with self._lock:
+                ok = self._cap.grab()
+            with self._cond:
+                if not ok:
+                    self.failed = True
+                    self._cond.notify_all()
+                    return
+                self._seq += 1
+                self.grabbed += 1
+                self.last_grab_at = time.monotonic()
+                self._cond.notify_all()
+
+    def start(self) -> None:
+        self._thread = Thread(target=self._run, daemon=True, name="StreamGrabber")
+        self._thread.start()
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Detiene el hilo y libera la captura (espera a que termine un grab() en curso)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self._cap.release()
+
+    def latest(self, timeout: float = 0.5):
+        """Decodifica el último cuadro tomado; None si no llegó uno nuevo a tiempo."""
+        with self._cond:
+            if self._seq == self._read_seq and not self.failed:
+                self._cond.wait(timeout)
+            seq = self._seq
+            if seq == self._read_seq:
+                return None
+            if self._read_seq:
+                self.dropped += seq - self._read_seq - 1
+            self._read_seq = seq
+        with self._lock:
+            ok, frame = self._cap.retrieve()
+        if not ok:
+            return None
+        self.retrieved += 1
+        return frame
+
 
 class VideoConfig:
-    def __init__(self, video_source: int = 0, use_optimized: bool = True):
+    def __init__(
+        self,
+        video_source: Union[int, str] = 0,
+        use_optimized: bool = True,
+        reconnect_min_seconds: float = 1.0,
+        reconnect_max_seconds: float = 30.0,
+        stall_seconds: float = 5.0,
+    ):
+        """video_source: índice de la cámara en el sistema, o URL (rtsp://, http://)
+        o ruta de un archivo, que se leen como stream con reconexión automática.
+        reconnect_*: espera inicial y máxima entre reintentos (backoff exponencial).
+        stall_seconds: sin cuadros nuevos durante este tiempo se reconecta."""
         self.video_source = video_source
         self.use_optimized = use_optimized
+        self.reconnect_min_seconds = reconnect_min_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.stall_seconds = stall_seconds
+
+    @property
+    def is_stream(self) -> bool:
+        return not isinstance(self.video_source, int)
 
 class VideoCapture:
+    """Captura de cámara desacoplada de los consumidores.
+
+    El hilo de captura sólo lee y publica; cada listener es una etapa con su
+    propio hilo y un slot acotado, de modo que una etapa lenta (p. ej. el
+    reconocimiento) pierde cuadros viejos en lugar de frenar `read()`.
+    Las fuentes de red (RTSP/HTTP) se leen con LatestFrameGrabber y se
+    reconectan solas si el stream se corta.
+    """
+
     _cap: cv2.VideoCapture
-    _listeners = []
-    _is_capturing = False
+    _listeners: List[FrameStage]
+    _is_capturing: bool
 
-    frame_count = 0
-    cap_configs = []
+    frame_count: int
+    cap_configs: list
 
     def _get_video_capture(self, target_source: int = 0) -> cv2.VideoCapture:
         """Obtiene una captura de video de la cámara."""
@@ -38,36 +269,177 @@ class VideoCapture:
             cap.release()
         raise RuntimeError("No se pudo abrir la cámara. Verifica permisos del sistema y que no esté en uso por otra aplicación.")
 
-    def __init__(self, config: VideoConfig):
+    def _get_stream_capture(self, url: str) -> cv2.VideoCapture:
+        """Abre un stream de red (o un archivo que lo simula) con FFmpeg."""
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            cap.release()
+            raise RuntimeError(f"No se pudo abrir el stream: {url}")
+        return cap
+
+    def __init__(self, config: VideoConfig, name: str = "default"):
+        """name: identificador de la cámara en las métricas."""
         cv2.setUseOptimized(config.use_optimized)
+        self._config = config
+        self.name = name
+        self._m_read = STAGE_SECONDS.labels(name, "read")
+        self._m_captured = FRAMES_CAPTURED.labels(name)
+        self._listeners = []
+        self._is_capturing = False
+        self.frame_count = 0
+        self.cap_configs = []
+        self._grabber: Optional[LatestFrameGrabber] = None
+        self.reconnects = 0
+        # Totales de conexiones anteriores del stream
+        self._grabbed_total = 0
+        self._dropped_total = 0
+        self.decode_fps = 0.0
+        self._fps_window_start = time.monotonic()
+        self._fps_window_frames = 0
 
     def set(self, propId: int, value: float):
         """Establece un parámetro de configuración de la cámara."""
         self.cap_configs.append((propId, value))
 
-    def add_listener(self, listener):
-        if listener not in self._listeners:
-            self._listeners.append(listener)
+    def add_listener(
+        self,
+        listener,
+        name: Optional[str] = None,
+        every_n: int = 1,
+        capacity: int = 1,
+        active: Optional[Callable[[], bool]] = None,
+    ):
+        """Registra una etapa consumidora.
+        every_n: sólo recibe 1 de cada n cuadros capturados.
+        capacity: cuadros que puede acumular antes de descartar los más viejos.
+        active: si se indica, la etapa sólo recibe cuadros mientras devuelva True."""
+        if any(stage.handler is listener for stage in self._listeners):
+            return
+        stage_name = name or f"stage{len(self._listeners)}"
+        self._listeners.append(
+            FrameStage(
+                stage_name,
+                listener,
+                every_n,
+                capacity,
+                active,
+                drop_counter=FRAMES_DROPPED.labels(self.name, stage_name),
+            )
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad de cola y contadores por etapa."""
+        grabber = self._grabber
+        return {
+            "capturing": self._is_capturing,
+            "frames_captured": self.frame_count,
+            "source": {
+                "type": "stream" if self._config.is_stream else "camera",
+                "connected": self._is_capturing and (grabber is not None or not self._config.is_stream),
+                "decode_fps": round(self.decode_fps, 2),
+                "grabbed": self._grabbed_total + (grabber.grabbed if grabber else 0)
+                if self._config.is_stream
+                else self.frame_count,
+                "dropped": self._dropped_total + (grabber.dropped if grabber else 0),
+                "reconnects": self.reconnects,
+            },
+            "stages": {stage.name: stage.stats() for stage in self._listeners},
+        }
+
+    def _publish(self, frame) -> None:
+        self.frame_count += 1
+        self._m_captured.inc()
+        self._fps_window_frames += 1
+        now = time.monotonic()
+        if now - self._fps_window_start >= 1.0:
+            self.decode_fps = self._fps_window_frames / (now - self._fps_window_start)
+            self._fps_window_start = now
+            self._fps_window_frames = 0
+        for stage in self._listeners:
+            stage.offer(self.frame_count, frame)
 
     def _loop(self, can_run):
         while can_run():
-            self.frame_count += 1
+            start = time.perf_counter()
             ret, frame = self._cap.read()
+            self._m_read.observe(time.perf_counter() - start)
             if not ret:
                 print("No se pudo capturar el frame")
                 break
-            for listener in self._listeners:
-                listener(frame)
+            self._publish(frame)
 
-    def start(self, can_run):
-        self._cap = self._get_video_capture()
+    @staticmethod
+    def _sleep(seconds: float, can_run) -> None:
+        deadline = time.monotonic() + seconds
+        while can_run() and time.monotonic() < deadline:
+            time.sleep(min(0.2, deadline - time.monotonic()))
 
-        for propId, value in self.cap_configs:
-            self._cap.set(propId, value)
+    def _stream_loop(self, can_run):
+        """Lee el stream y reconecta con backoff exponencial hasta que can_run() sea False."""
+        source = str(self._config.video_source)
+        # Un archivo local se reproduce a su ritmo natural, como una cámara en vivo
+        is_file = os.path.isfile(source)
+        backoff = self._config.reconnect_min_seconds
+        while can_run():
+            try:
+                self._cap = self._get_stream_capture(source)
+            except RuntimeError as e:
+                print(f"{e}; reintentando en {backoff:.1f}s")
+                self._sleep(backoff, can_run)
+                backoff = min(backoff * 2, self._config.reconnect_max_seconds)
+                self.reconnects += 1
+                continue
 
-        self.frame_count = 0
-        self._loop(lambda: can_run())
-        self._cap.release()
-        cv2.destroyAllWindows()
-        self._is_capturing = False
+            for propId, value in self.cap_configs:
+                self._cap.set(propId, value)
+            backoff = self._config.reconnect_min_seconds
+            pace_fps = (self._cap.get(cv2.CAP_PROP_FPS) or 25.0) if is_file else 0.0
+            self._grabber = LatestFrameGrabber(self._cap, pace_fps)
+            self._grabber.start()
+            try:
+                while can_run():
+                    start = time.perf_counter()
+                    frame = self._grabber.latest()
+                    if frame is not None:
+                        self._m_read.observe(time.perf_counter() - start)
+                        self._publish(frame)
+                        continue
+                    if self._grabber.failed:
+                        print(f"Se cortó el stream: {source}")
+                        break
+                    if time.monotonic() - self._grabber.last_grab_at > self._config.stall_seconds:
+                        print(f"El stream no envía cuadros hace {self._config.stall_seconds:.0f}s: {source}")
+                        break
+            finally:
+                self._grabber.close()
+                self._grabbed_total += self._grabber.grabbed
+                self._dropped_total += self._grabber.dropped
+                self._grabber = None
+                self.decode_fps = 0.0
+            if can_run():
+                self.reconnects += 1
+                self._sleep(backoff, can_run)
 
+    def start(self, can_run):
+        self.frame_count = 0
+        self.reconnects = 0
+        self._grabbed_total = 0
+        self._dropped_total = 0
+        self._is_capturing = True
+        for stage in self._listeners:
+            stage.start()
+        try:
+            if self._config.is_stream:
+                self._stream_loop(can_run)
+                return
+            self._cap = self._get_video_capture(self._config.video_source)
+            for propId, value in self.cap_configs:
+                self._cap.set(propId, value)
+            try:
+                self._loop(lambda: can_run())
+            finally:
+                self._cap.release()
+        finally:
+            for stage in self._listeners:
+                stage.stop()
+            self._is_capturing = False
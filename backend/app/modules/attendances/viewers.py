@@ -0,0 +1,19 @@
+import cv2
+
+
+class WindowViewer:
+    """Muestra el cuadro anotado en una ventana local de OpenCV (requiere entorno gráfico)."""
+
+    def __init__(self, window_name: str) -> None:
+        self.window_name = window_name
+
+    def show(self, frame: cv2.typing.MatLike) -> None:
+        cv2.imshow(self.window_name, frame)
+        # waitKey es necesario para que la ventana se refresque; la detención se controla desde la API
+        cv2.waitKey(1)
+
+    def close(self) -> None:
+        try:
+            cv2.destroyWindow(self.window_name)
+        except cv2.error:
+            pass
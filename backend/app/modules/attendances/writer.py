@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from . import repository as repo
+
+
+def _today() -> date:
+    # El día de asistencia se corta a medianoche UTC, igual que en el repositorio
+    return datetime.now(timezone.utc).date()
+
+
+class AttendanceWriter:
+    """Cache write-behind de asistencias.
+
+    - Un set LRU de personas ya marcadas en el día evita consultar la base
+      por cada aparición; se vacía al cambiar el día.
+    - Las apariciones de la misma persona dentro de `debounce_seconds` se
+      descartan sin más trabajo.
+    - Las asistencias nuevas se encolan y se escriben con insert_many al
+      llegar a `batch_size` o pasados `flush_interval` segundos.
+    - Cada asistencia encolada se agrega a un journal en disco (en un hilo,
+      fuera del event loop) antes de que `mark` devuelva; si el proceso muere
+      antes del flush, `recover()` la reinserta al arrancar (el índice único
+      por persona y día hace la reinserción idempotente).
+    - Los flushes se serializan: el journal sólo se recorta después de que
+      el lote en vuelo quedó escrito en la base.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        journal_path: str,
+        debounce_seconds: float,
+        max_marked: int = 10000,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self._db = db
+        self._journal_path = journal_path
+        self.debounce_seconds = debounce_seconds
+        self.max_marked = max_marked
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._day = _today()
+        self._marked: "OrderedDict[str, None]" = OrderedDict()
+        self._last_seen: "OrderedDict[str, float]" = OrderedDict()
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = Lock()
+        # Serializa las escrituras al archivo del journal (appends y recortes desde hilos)
+        self._journal_lock = Lock()
+        self._flush_lock = asyncio.Lock()
+        self._last_flush = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.stats = {"seen": 0, "debounced": 0, "cache_hits": 0, "db_checks": 0, "queued": 0, "flushed": 0}
+
+    # --- Estado en memoria -------------------------------------------------
+
+    def _rollover(self) -> None:
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._marked.clear()
+
+    def _remember(self, person_id: str) -> None:
+        self._marked[person_id] = None
+        self._marked.move_to_end(person_id)
+        while len(self._marked) > self.max_marked:
+            self._marked.popitem(last=False)
+
+    def _debounced(self, person_id: str, now: float) -> bool:
+        """True si la persona ya pasó el filtro hace menos de debounce_seconds."""
+        last = self._last_seen.get(person_id)
+        return last is not None and now - last < self.debounce_seconds
+
+    def _touch(self, person_id: str, now: float) -> None:
+        """Registra que la persona pasó el filtro (empieza su ventana de debounce)."""
+        self._last_seen[person_id] = now
+        self._last_seen.move_to_end(person_id)
+        while len(self._last_seen) > self.max_marked:
+            self._last_seen.popitem(last=False)
+
+    # --- Journal -----------------------------------------------------------
+
+    def _journal_append(self, doc: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self._journal_path), exist_ok=True)
+        line = json.dumps(
+            {
+                "person_id": doc["person_id"],
+                "attendance_time": doc["attendance_time"].isoformat(),
+                "day": doc["day"],
+            }
+        )
+        with self._journal_lock, open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _journal_read(self) -> List[Dict[str, Any]]:
+        docs = []
+        try:
+            with open(self._journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                        docs.append(
+                            {
+                                "person_id": item["person_id"],
+                                "attendance_time": datetime.fromisoformat(item["attendance_time"]),
+                                "day": item["day"],
+                            }
+                        )
+                    except (ValueError, KeyError):
+                        # Línea cortada por una caída a mitad de escritura
+                        continue
+        except FileNotFoundError:
+            pass
+        return docs
+
+    def _journal_truncate(self) -> None:
+        """Deja en el journal sólo las asistencias encoladas. La lista se toma con el
+        lock del journal tomado, así ningún append queda entre la copia y el reemplazo."""
+        tmp = self._journal_path + ".tmp"
+        with self._journal_lock:
+            with self._lock:
+                keep = list(self._pending)
+            self._journal_write(tmp, keep)
+            os.replace(tmp, self._journal_path)
+
+    def _journal_write(self, path: str, keep: List[Dict[str, Any]]) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for doc in keep:
+                f.write(
+                    json.dumps(
+                        {
+                            "person_id": doc["person_id"],
+                            "attendance_time": doc["attendance_time"].isoformat(),
+                            "day": doc["day"],
+                        }
+                    )
+                    + "\n"
+                )
+
+    # --- API ---------------------------------------------------------------
+
+    async def mark(self, person_id: str) -> bool:
+        """Registra una aparición. Devuelve True si generó una asistencia nueva."""
+        now = time.monotonic()
+        with self._lock:
+            self.stats["seen"] += 1
+            self._rollover()
+            if self._debounced(person_id, now):
+                self.stats["debounced"] += 1
+                return False
+            if person_id in self._marked:
+                self._touch(person_id, now)
+                self._marked.move_to_end(person_id)
+                self.stats["cache_hits"] += 1
+                return False
+            day = self._day
+            self.stats["db_checks"] += 1
+
+        # Fuera de la cache (nuevo o expulsado por LRU): confirmar contra la base.
+        # El debounce empieza recién si la consulta salió bien: un error no deja
+        # a la persona afuera durante debounce_seconds.
+        exists = await repo.has_attendance_on_day(self._db, person_id, day)
+        with self._lock:
+            self._touch(person_id, now)
+            if exists or person_id in self._marked:
+                self._remember(person_id)
+                return False
+            doc = {
+                "person_id": person_id,
+                "attendance_time": datetime.now(timezone.utc),
+                "day": day.isoformat(),
+            }
+            # Se encola antes de escribir el journal: un recorte concurrente la conserva
+            self._remember(person_id)
+            self._pending.append(doc)
+            self.stats["queued"] += 1
+        try:
+            await run_in_threadpool(self._journal_append, doc)
+        except OSError as e:
+            print(f"No se pudo escribir el journal de asistencias: {e}")
+        with self._lock:
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            await self.flush()
+        return True
+
+    async def flush(self) -> int:
+        """Escribe las asistencias encoladas con un único insert_many."""
+        async with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = []
+                self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+            try:
+                await repo.insert_attendances(self._db, batch)
+            except Exception as e:
+                print(f"No se pudieron guardar {len(batch)} asistencias, se reintentará: {e}")
+                with self._lock:
+                    self._pending = batch + self._pending
+                return 0
+            with self._lock:
+                self.stats["flushed"] += len(batch)
+            # Con el flush serializado no hay otro lote en vuelo: lo que queda sin
+            # escribir está en _pending
+            await run_in_threadpool(self._journal_truncate)
+            return len(batch)
+
+    async def recover(self) -> int:
+        """Reinserta las asistencias del journal que no llegaron a la base."""
+        async with self._flush_lock:
+            docs = await run_in_threadpool(self._journal_read)
+            if not docs:
+                return 0
+            try:
+                await repo.insert_attendances(self._db, docs)
+            except Exception as e:
+                print(f"No se pudo recuperar el journal de asistencias: {e}")
+                return 0
+            await run_in_threadpool(self._journal_truncate)
+        with self._lock:
+            today = self._day.isoformat()
+            for doc in docs:
+                if doc["day"] == today:
+                    self._remember(doc["person_id"])
+        print(f"Se recuperaron {len(docs)} asistencias del journal")
+        return len(docs)
+
+    async def warm_up(self) -> None:
+        """Precarga las personas ya marcadas hoy (una sola consulta)."""
+        person_ids = await repo.list_person_ids_on_day(self._db, self._day, self.max_marked)
+        with self._lock:
+            for person_id in person_ids:
+                self._remember(person_id)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            with self._lock:
+                due = self._pending and time.monotonic() - self._last_flush >= self.flush_interval
+            if due:
+                await self.flush()
+
+    def start(self) -> None:
+        """Arranca el flush por tiempo en el event loop actual."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
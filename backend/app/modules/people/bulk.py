@@ -0,0 +1,99 @@
+"""Entrada del alta masiva: CSV de metadatos y fotos en un ZIP o en varios archivos.
+
+El CSV (UTF-8, con encabezado) tiene una fila por persona con las columnas
+`full_name` (obligatoria), `email`, `grade`, `group` y `photo`, el nombre del
+archivo de la foto dentro del ZIP o de los archivos subidos (puede ir vacío).
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import zipfile
+from typing import Dict, List, NamedTuple, Optional
+
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png")
+FIELDS = ("full_name", "email", "grade", "group")
+
+
+class BulkRow(NamedTuple):
+    line: int  # línea del CSV, para informar el resultado de cada fila
+    data: Dict[str, Optional[str]]
+    photo: Optional[str]
+
+
+def parse_metadata(content: bytes, max_items: int) -> List[BulkRow]:
+    """Filas del CSV. ValueError si no se puede leer, falta `full_name` o supera max_items."""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("El CSV debe estar en UTF-8.")
+    reader = csv.DictReader(io.StringIO(text))
+    columns = [c.strip() for c in reader.fieldnames or []]
+    if "full_name" not in columns:
+        raise ValueError("El CSV debe tener encabezado con la columna 'full_name'.")
+    rows = []
+    for record in reader:
+        record = {(k or "").strip(): (v or "").strip() for k, v in record.items() if k is not None}
+        if not any(record.values()):
+            continue
+        rows.append(
+            BulkRow(
+                line=reader.line_num,
+                data={field: record.get(field) or None for field in FIELDS},
+                photo=record.get("photo") or None,
+            )
+        )
+        if len(rows) > max_items:
+            raise ValueError(f"Se admiten como mucho {max_items} filas por pedido.")
+    if not rows:
+        raise ValueError("El CSV no tiene filas.")
+    return rows
+
+
+class PhotoSource:
+    """Fotos del alta masiva por nombre de archivo (se busca también sólo por el nombre, sin carpetas)."""
+
+    def __init__(self) -> None:
+        self._archive: Optional[zipfile.ZipFile] = None
+        self._members: Dict[str, str] = {}
+        self._files: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_zip(cls, content: bytes) -> "PhotoSource":
+        """ValueError si el archivo no es un ZIP válido."""
+        source = cls()
+        try:
+            source._archive = zipfile.ZipFile(io.BytesIO(content))
+        except zipfile.BadZipFile:
+            raise ValueError("El archivo de fotos no es un ZIP válido.")
+        for info in source._archive.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            source._members[info.filename] = info.filename
+            source._members.setdefault(os.path.basename(info.filename), info.filename)
+        return source
+
+    def add_file(self, filename: str, content: bytes) -> None:
+        self._files[os.path.basename(filename or "")] = content
+
+    def __len__(self) -> int:
+        return len(set(self._members.values())) + len(self._files)
+
+    def read(self, name: str) -> bytes:
+        """Contenido de una foto (seguro entre hilos). ValueError si no está o no es PNG/JPEG."""
+        if not name.lower().endswith(PHOTO_EXTENSIONS):
+            raise ValueError(f"Formato no soportado: '{name}'. Usar PNG o JPEG.")
+        if name in self._files:
+            return self._files[name]
+        if os.path.basename(name) in self._files:
+            return self._files[os.path.basename(name)]
+        member = self._members.get(name) or self._members.get(os.path.basename(name))
+        if member is None or self._archive is None:
+            raise ValueError(f"No se encontró la foto '{name}'.")
+        return self._archive.read(member)
+
+    def close(self) -> None:
+        if self._archive is not None:
+            self._archive.close()
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 COLLECTION = "people"
 
+# Personas con al menos un embedding guardado, es decir, presentes en la galería
+_HAS_EMBEDDINGS = {
+    "$or": [
+        {"photo_embedding": {"$type": "binData", "$ne": b""}},
+        {"extra_photo_embeddings.0": {"$exists": True}},
+    ]
+}
+
 
 def _ensure_object_id(id_str: str) -> ObjectId:
     try:
@@ -25,8 +33,9 @@ def _serialize(doc: Dict[str, Any]) -> Dict[str, Any]:
         "group": doc.get("group"),
         "created_at": doc.get("created_at"),
         "updated_at": doc.get("updated_at"),
-        # raw field for service mapping
+        # raw fields for service mapping
         "photo_path": doc.get("photo_path"),
+        "extra_photo_paths": doc.get("extra_photo_paths"),
     }
 
 
@@ -52,8 +61,7 @@ async def get_person_raw(db: AsyncIOMotorDatabase, person_id: str) -> Optional[D
     return await db[COLLECTION].find_one({"_id": oid})
 
 
-async def create_person(db: AsyncIOMotorDatabase, data: Dict[str, Any]) -> Dict[str, Any]:
-    now = datetime.now(timezone.utc)
+def _new_document(data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
     doc = {
         "full_name": data["full_name"],
         "email": data.get("email"),
@@ -62,9 +70,20 @@ async def create_person(db: AsyncIOMotorDatabase, data: Dict[str, Any]) -> Dict[
         "created_at": now,
         "updated_at": None,
     }
+    # Id fijado de antemano (la foto se guarda con el id como nombre)
+    if data.get("_id"):
+        doc["_id"] = _ensure_object_id(data["_id"])
     # Optional local path to saved photo
     if data.get("photo_path"):
         doc["photo_path"] = data["photo_path"]
+    # Embedding de la foto, binario (ver face_library.embedding_to_bytes); vacío si no se pudo obtener
+    if data.get("photo_embedding") is not None:
+        doc["photo_embedding"] = data["photo_embedding"]
+    return doc
+
+
+async def create_person(db: AsyncIOMotorDatabase, data: Dict[str, Any]) -> Dict[str, Any]:
+    doc = _new_document(data, datetime.now(timezone.utc))
     res = await db[COLLECTION].insert_one(doc)
     created = await db[COLLECTION].find_one({"_id": res.inserted_id})
     if not created:
@@ -72,6 +91,17 @@ async def create_person(db: AsyncIOMotorDatabase, data: Dict[str, Any]) -> Dict[
     return _serialize(created)
 
 
+async def create_people(db: AsyncIOMotorDatabase, items: List[Dict[str, Any]]) -> List[str]:
+    """Alta de varias personas con un solo insert_many (sin releerlas: cada una debe traer su `_id`).
+    Devuelve los ids insertados; ante un error de escritura se insertan igual las demás
+    (ordered=False) y BulkWriteError informa cuáles fallaron."""
+    if not items:
+        return []
+    now = datetime.now(timezone.utc)
+    res = await db[COLLECTION].insert_many([_new_document(data, now) for data in items], ordered=False)
+    return [str(oid) for oid in res.inserted_ids]
+
+
 async def update_person(db: AsyncIOMotorDatabase, person_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     oid = _ensure_object_id(person_id)
     set_fields: Dict[str, Any] = {k: v for k, v in data.items() if v is not None}
@@ -92,3 +122,41 @@ async def delete_person(db: AsyncIOMotorDatabase, person_id: str) -> bool:
     oid = _ensure_object_id(person_id)
     res = await db[COLLECTION].delete_one({"_id": oid})
     return res.deleted_count > 0
+
+
+async def list_face_embeddings(db: AsyncIOMotorDatabase) -> List[Tuple[str, List[bytes]]]:
+    """(person_id, embeddings) de todas las personas con al menos uno, en una sola
+    consulta con proyección: la foto principal primero y luego las adicionales."""
+    query = dict(_HAS_EMBEDDINGS)
+    projection = {"photo_embedding": 1, "extra_photo_embeddings": 1}
+    people = []
+    async for d in db[COLLECTION].find(query, projection):
+        blobs = [d["photo_embedding"]] if d.get("photo_embedding") else []
+        blobs.extend(d.get("extra_photo_embeddings") or [])
+        people.append((str(d["_id"]), [bytes(b) for b in blobs]))
+    return people
+
+
+async def list_missing_embeddings(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Personas con foto pero sin embedding guardado (cargadas antes de guardarlos en la base)."""
+    query = {"photo_path": {"$nin": [None, ""]}, "photo_embedding": {"$exists": False}}
+    cursor = db[COLLECTION].find(query, {"photo_path": 1})
+    return [{"id": str(d["_id"]), "photo_path": d["photo_path"]} async for d in cursor]
+
+
+async def list_person_ids(
+    db: AsyncIOMotorDatabase,
+    grade: Optional[str] = None,
+    group: Optional[str] = None,
+    person_ids: Optional[List[str]] = None,
+) -> List[str]:
+    """Ids de las personas que cumplen el filtro (sólo las que están en la galería)."""
+    query: Dict[str, Any] = dict(_HAS_EMBEDDINGS)
+    if grade:
+        query["grade"] = grade
+    if group:
+        query["group"] = group
+    if person_ids:
+        query["_id"] = {"$in": [_ensure_object_id(pid) for pid in person_ids]}
+    cursor = db[COLLECTION].find(query, {"_id": 1})
+    return [str(d["_id"]) async for d in cursor]
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException, Query, Request, UploadFile, File, Form, Response
+from fastapi.responses import StreamingResponse
 
 from .schemas import PersonIn, PersonOut
 from . import service
@@ -59,6 +60,31 @@ async def create_person(
         raise HTTPException(status_code=500, detail=f"No se pudo guardar la imagen: {e}")
 
 
+@router.post(
+    "/bulk",
+    summary="Alta masiva de personas",
+    description=(
+        "Da de alta muchas personas en un solo pedido. multipart/form-data con 'metadata', un CSV "
+        "(UTF-8, columnas full_name, email, grade, group y photo) y las fotos en 'archive' (ZIP) "
+        "y/o en uno o más 'photos'; la columna photo es el nombre del archivo. Responde en NDJSON "
+        "(application/x-ndjson) a medida que avanza: una línea por fila con status 'created' o "
+        "'error' y al final una línea con el resumen. Las filas con error no se guardan."
+    ),
+)
+async def bulk_create_people(
+    request: Request,
+    metadata: UploadFile = File(...),
+    archive: UploadFile = File(None),
+    photos: List[UploadFile] = File(None),
+):
+    db = get_db(request)
+    try:
+        rows, source = await service.prepare_bulk_import(metadata, archive, photos)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(service.import_people(db, rows, source), media_type="application/x-ndjson")
+
+
 @router.get(
     "/{person_id}",
     response_model=PersonOut,
@@ -127,6 +153,49 @@ async def delete_person_photo(person_id: str, request: Request):
     return updated
 
 
+@router.post(
+    "/{person_id}/photos",
+    response_model=PersonOut,
+    summary="Agregar una foto adicional",
+    description=(
+        "Sube otra foto de la persona (PNG/JPEG) para mejorar el reconocimiento: ángulos, "
+        "iluminación o anteojos distintos. Todas sus fotos se usan al emparejar, hasta "
+        "GALLERY_MAX_EXEMPLARS en total contando la principal."
+    ),
+)
+async def add_person_photo(
+    person_id: str,
+    request: Request,
+    photo: UploadFile = File(...),
+):
+    db = get_db(request)
+    try:
+        updated = await service.add_person_photo(db, person_id, photo)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Persona no encontrada")
+        return updated
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo guardar la imagen: {e}")
+
+
+@router.delete(
+    "/{person_id}/photos",
+    response_model=PersonOut,
+    summary="Eliminar las fotos adicionales",
+    description="Elimina las fotos adicionales de la persona; la foto principal se conserva.",
+)
+async def delete_person_extra_photos(person_id: str, request: Request):
+    db = get_db(request)
+    updated = await service.delete_person_extra_photos(db, person_id)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Persona no encontrada")
+    return updated
+
+
 """ @router.delete(
     "/{person_id}",
     status_code=204,
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -34,3 +34,6 @@ class PersonOut(PersonBase):
     updated_at: Optional[datetime] = Field(None, description="Fecha de última actualización")
     has_photo: bool = Field(False, description="Indica si la persona tiene una foto almacenada")
     photo_url: Optional[str] = Field(None, description="URL relativa para acceder a la foto (/static/...) si existe")
+    extra_photo_urls: List[str] = Field(
+        default_factory=list, description="URLs de las fotos adicionales usadas para el reconocimiento"
+    )
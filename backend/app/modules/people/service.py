@@ -1,15 +1,32 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 import os
 
+import numpy as np
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson.objectid import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
 
 from . import repository as repo
 from fastapi import UploadFile
-from .storage import save_person_photo, delete_person_photo as storage_delete_photo
+from fastapi.concurrency import run_in_threadpool
+from .bulk import BulkRow, PhotoSource, parse_metadata
+from .schemas import PersonIn
+from .storage import (
+    delete_person_photo as storage_delete_photo,
+    photo_variant,
+    save_person_photo,
+    store_face_photo,
+)
 from ...core.config import settings
+from ..attendances.devices import face_library, recognition_pool
+from ..attendances.face_library import embedding_from_bytes, embedding_to_bytes, encode_photo
 
 
 async def list_people(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
@@ -46,9 +63,10 @@ async def create_person_with_photo(
     person_id = str(ObjectId())
     data = {**data, "_id": person_id, "photo_path": None}  # Ensure id is set
     if photo is not None:
-        rel_path = await save_person_photo(photo, person_id)
-        data = {**data, "photo_path": rel_path}
+        rel_path, encoding = await save_person_photo(photo, person_id)
+        data = {**data, "photo_path": rel_path, "photo_embedding": _to_binary(rel_path, encoding)}
     created = await repo.create_person(db, data)
+    _gallery_sync(person_id, data.get("photo_embedding"), [])
     return _present_person(created)
 
 
@@ -62,13 +80,16 @@ async def set_person_photo(
     if not existing:
         return None
 
-    # delete previous if any
+    # La foto nueva se guarda primero (si falla, la anterior sigue intacta); la anterior
+    # se borra recién cuando la base apunta a la nueva. Con el mismo nombre, la escritura
+    # atómica ya la reemplazó.
+    rel_path, encoding = await save_person_photo(photo, person_id)
+    embedding = _to_binary(rel_path, encoding)
+    updated = await repo.update_person(db, person_id, {"photo_path": rel_path, "photo_embedding": embedding})
     prev_rel = existing.get("photo_path")
-    if prev_rel:
+    if prev_rel and prev_rel != rel_path:
         storage_delete_photo(prev_rel)
-
-    rel_path = await save_person_photo(photo, person_id)
-    updated = await repo.update_person(db, person_id, {"photo_path": rel_path})
+    _gallery_sync(person_id, embedding, existing.get("extra_photo_embeddings"))
     return _present_person(updated) if updated else None
 
 
@@ -79,7 +100,54 @@ async def delete_person_photo(db: AsyncIOMotorDatabase, person_id: str) -> Optio
     prev_rel = existing.get("photo_path")
     if prev_rel:
         storage_delete_photo(prev_rel)
-    updated = await repo.update_person(db, person_id, {"photo_path": None})
+    updated = await repo.update_person(db, person_id, {"photo_path": None, "photo_embedding": None})
+    _gallery_sync(person_id, None, existing.get("extra_photo_embeddings"))
+    return _present_person(updated) if updated else None
+
+
+async def add_person_photo(
+    db: AsyncIOMotorDatabase,
+    person_id: str,
+    photo: UploadFile,
+) -> Optional[Dict[str, Any]]:
+    """Agrega una foto adicional de la persona; todas sus fotos se usan para reconocerla.
+    ValueError si ya tiene el máximo de fotos o si no se pudo obtener el embedding."""
+    existing = await repo.get_person_raw(db, person_id)
+    if not existing:
+        return None
+    extras = list(existing.get("extra_photo_paths") or [])
+    extra_embeddings = list(existing.get("extra_photo_embeddings") or [])
+    if len(extras) >= settings.GALLERY_MAX_EXEMPLARS - 1:
+        raise ValueError(f"La persona ya tiene el máximo de {settings.GALLERY_MAX_EXEMPLARS} fotos.")
+
+    variant = max((photo_variant(p) for p in extras), default=0) + 1
+    rel_path, encoding = await save_person_photo(photo, person_id, variant=variant)
+    embedding = _to_binary(rel_path, encoding)
+    if not embedding:
+        # Una foto adicional sólo sirve si aporta un embedding
+        storage_delete_photo(rel_path)
+        raise ValueError("No se pudo obtener el embedding del rostro.")
+    # Rutas y embeddings adicionales van en listas paralelas
+    extras.append(rel_path)
+    extra_embeddings.append(embedding)
+    updated = await repo.update_person(
+        db, person_id, {"extra_photo_paths": extras, "extra_photo_embeddings": extra_embeddings}
+    )
+    _gallery_sync(person_id, existing.get("photo_embedding"), extra_embeddings)
+    return _present_person(updated) if updated else None
+
+
+async def delete_person_extra_photos(db: AsyncIOMotorDatabase, person_id: str) -> Optional[Dict[str, Any]]:
+    """Elimina las fotos adicionales de la persona (conserva la principal)."""
+    existing = await repo.get_person_raw(db, person_id)
+    if not existing:
+        return None
+    for rel_path in existing.get("extra_photo_paths") or []:
+        storage_delete_photo(rel_path)
+    updated = await repo.update_person(
+        db, person_id, {"extra_photo_paths": None, "extra_photo_embeddings": None}
+    )
+    _gallery_sync(person_id, existing.get("photo_embedding"), [])
     return _present_person(updated) if updated else None
 
 
@@ -90,12 +158,156 @@ async def delete_person(db: AsyncIOMotorDatabase, person_id: str) -> bool:
     existing = await repo.get_person_raw(db, person_id)
     if not existing:
         return False
-    prev_rel = existing.get("photo_path")
-    if prev_rel:
-        storage_delete_photo(prev_rel)
+    for rel_path in [existing.get("photo_path")] + list(existing.get("extra_photo_paths") or []):
+        storage_delete_photo(rel_path)
+    face_library.remove_person(person_id)
     return await repo.delete_person(db, person_id)
 
 
+class _PreparedRow(NamedTuple):
+    row: BulkRow
+    person_id: str
+    photo_path: Optional[str] = None
+    face: Optional[np.ndarray] = None
+    error: Optional[str] = None
+
+
+async def prepare_bulk_import(
+    metadata: UploadFile,
+    archive: Optional[UploadFile],
+    photos: Optional[List[UploadFile]],
+) -> Tuple[List[BulkRow], PhotoSource]:
+    """Lee el CSV y las fotos (ZIP o archivos sueltos) antes de empezar a responder,
+    así los errores de formato se informan con un 400. ValueError si algo no se puede leer."""
+    rows = parse_metadata(await metadata.read(), settings.BULK_MAX_ITEMS)
+    source = PhotoSource.from_zip(await archive.read()) if archive is not None else PhotoSource()
+    for photo in photos or []:
+        source.add_file(photo.filename, await photo.read())
+    if any(row.photo for row in rows) and len(source) == 0:
+        raise ValueError("El CSV nombra fotos pero no se subió ningún ZIP ni archivo.")
+    return rows, source
+
+
+def _prepare_row(row: BulkRow, source: PhotoSource) -> _PreparedRow:
+    """En un hilo de trabajo: valida la fila, decodifica su foto y guarda el recorte del rostro."""
+    person_id = str(ObjectId())
+    if not row.data.get("full_name"):
+        return _PreparedRow(row, person_id, error="full_name es obligatorio.")
+    try:
+        PersonIn.model_validate(row.data)
+    except ValidationError as e:
+        error = e.errors()[0]
+        return _PreparedRow(row, person_id, error=f"{error['loc'][0]}: {error['msg']}")
+    if not row.photo:
+        return _PreparedRow(row, person_id)
+    try:
+        rel_path, face = store_face_photo(source.read(row.photo), person_id)
+    except Exception as e:
+        return _PreparedRow(row, person_id, error=str(e))
+    return _PreparedRow(row, person_id, photo_path=rel_path, face=face)
+
+
+async def import_people(
+    db: AsyncIOMotorDatabase, rows: List[BulkRow], source: PhotoSource
+) -> AsyncIterator[bytes]:
+    """Alta masiva, una línea NDJSON por fila y un resumen al final.
+
+    Cada tanda de BULK_CHUNK_SIZE filas se decodifica y detecta en paralelo
+    (BULK_WORKERS hilos), sus rostros se codifican juntos con el pool de
+    reconocimiento y se insertan con un solo insert_many. Una fila con error
+    no se inserta. La galería se actualiza una sola vez, al terminar.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    gallery_updates: List[Tuple[str, List[np.ndarray]]] = []
+    summary = {"total": len(rows), "created": 0, "failed": 0, "without_embedding": 0}
+    executor = ThreadPoolExecutor(max_workers=max(1, settings.BULK_WORKERS))
+    chunk_size = max(1, settings.BULK_CHUNK_SIZE)
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            prepared = await asyncio.gather(
+                *(loop.run_in_executor(executor, _prepare_row, row, source) for row in chunk)
+            )
+            ok = [item for item in prepared if item.error is None]
+            with_face = [item for item in ok if item.face is not None]
+            encodings = await run_in_threadpool(recognition_pool.encode, [item.face for item in with_face])
+            encoding_of = {item.person_id: encoding for item, encoding in zip(with_face, encodings)}
+
+            documents = []
+            for item in ok:
+                document = {**item.row.data, "_id": item.person_id, "photo_path": item.photo_path}
+                if item.photo_path:
+                    document["photo_embedding"] = _to_binary(item.photo_path, encoding_of[item.person_id])
+                documents.append(document)
+            failed: Dict[str, str] = {}
+            try:
+                await repo.create_people(db, documents)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed[documents[error["index"]]["_id"]] = error.get("errmsg", "Error al guardar")
+
+            for item in prepared:
+                result: Dict[str, Any] = {"line": item.row.line, "full_name": item.row.data.get("full_name")}
+                error = item.error or failed.get(item.person_id)
+                if error is not None:
+                    storage_delete_photo(item.photo_path)
+                    result.update(status="error", error=error)
+                    summary["failed"] += 1
+                else:
+                    encoding = encoding_of.get(item.person_id)
+                    if encoding is not None:
+                        gallery_updates.append((item.person_id, [encoding]))
+                    elif item.photo_path:
+                        summary["without_embedding"] += 1
+                    result.update(
+                        status="created",
+                        id=item.person_id,
+                        has_photo=bool(item.photo_path),
+                        has_embedding=encoding is not None,
+                    )
+                    summary["created"] += 1
+                yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        yield (json.dumps({"summary": summary}) + "\n").encode("utf-8")
+    finally:
+        executor.shutdown(wait=False)
+        source.close()
+        # Aunque el cliente corte la respuesta, lo ya insertado queda en la galería
+        face_library.set_people(gallery_updates)
+
+
+async def backfill_embeddings(db: AsyncIOMotorDatabase) -> int:
+    """Calcula y guarda el embedding de las personas cargadas antes de que se
+    guardaran en la base (una sola vez; después la galería ya no lee imágenes)."""
+    pending = await repo.list_missing_embeddings(db)
+    for person in pending:
+        encoding = await run_in_threadpool(
+            encode_photo, os.path.join(settings.MEDIA_ROOT, person["photo_path"])
+        )
+        await repo.update_person(
+            db, person["id"], {"photo_embedding": _to_binary(person["photo_path"], encoding)}
+        )
+    if pending:
+        print(f"Se calcularon los embeddings de {len(pending)} fotos existentes")
+    return len(pending)
+
+
+def _to_binary(rel_path: str, encoding) -> bytes:
+    """Embedding para guardar en la persona; vacío si no se pudo obtener (así no se
+    vuelve a intentar en cada arranque)."""
+    if encoding is None:
+        print(f"No se pudo obtener el embedding de la foto: {rel_path}")
+        return b""
+    return embedding_to_bytes(encoding)
+
+
+def _gallery_sync(person_id: str, photo_embedding: Optional[bytes], extra_embeddings) -> None:
+    """Refleja en la galería compartida los embeddings guardados de una persona."""
+    blobs = ([photo_embedding] if photo_embedding else []) + list(extra_embeddings or [])
+    face_library.set_person(person_id, [embedding_from_bytes(bytes(b)) for b in blobs])
+
+
 def _present_person(doc: Dict[str, Any]) -> Dict[str, Any]:
     """Map repository document to API shape, computing has_photo and photo_url.
     Removes internal photo_path from outward responses.
@@ -105,6 +317,11 @@ def _present_person(doc: Dict[str, Any]) -> Dict[str, Any]:
     photo_path = doc.get("photo_path")
     presented = {**doc}
     presented.pop("photo_path", None)
+    presented["extra_photo_urls"] = [
+        f"/static/{rel_path}"
+        for rel_path in presented.pop("extra_photo_paths", None) or []
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, rel_path))
+    ]
     # Validate file existence to avoid broken links when the file was removed manually
     exists = bool(photo_path) and os.path.exists(os.path.join(settings.MEDIA_ROOT, photo_path))
     presented["has_photo"] = bool(exists)
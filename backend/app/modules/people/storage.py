@@ -2,13 +2,18 @@ from __future__ import annotations
 
 import os
 import re
-from typing import Optional
+import struct
+import tempfile
+from typing import Optional, Tuple
 
 import cv2
+import numpy as np
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 from ...core.config import settings
 from ...utils.face_utils import detect_faces
+from ..attendances.recognition import encode_face
 
 ALLOWED_CONTENT_TYPES = {"image/png", "image/jpeg", "image/jpg"}
 
@@ -33,44 +38,108 @@ def normalize_filename(name: str) -> str:
     return name
 
 
-async def save_person_photo(file: UploadFile, full_name: str) -> str:
-    """
-    Guarda una foto de persona, procesa el rostro y devuelve la ruta relativa optimizada.
-    """
-    if (file.content_type or "").lower() not in ALLOWED_CONTENT_TYPES:
-        raise ValueError("Invalid content type. Use PNG or JPEG.")
+def image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(ancho, alto) leídos del encabezado PNG o JPEG, sin decodificar; None si no se reconoce."""
+    view = memoryview(data)
+    if len(view) >= 24 and view[:8] == b"\x89PNG\r\n\x1a\n":
+        # IHDR: ancho y alto big-endian a partir del byte 16
+        return struct.unpack(">II", view[16:24])
+    if view[:2] != b"\xff\xd8":
+        return None
+    # JPEG: recorrer los segmentos hasta el SOFn, que trae alto y ancho
+    i = 2
+    while i + 9 <= len(view):
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:  # relleno
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # marcadores sin longitud
+            i += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", view[i + 5 : i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", view[i + 2 : i + 4])[0]
+    return None
+
+
+def decode_photo(data: bytes) -> np.ndarray:
+    """Decodifica una foto subida directo desde memoria (sin archivo temporal).
+    ValueError si el encabezado indica más de MAX_PHOTO_PIXELS o si no se puede leer."""
+    size = image_size(data)
+    if size is not None and size[0] * size[1] > settings.MAX_PHOTO_PIXELS:
+        raise ValueError(
+            f"La imagen es demasiado grande ({size[0]}x{size[1]}); "
+            f"máximo {settings.MAX_PHOTO_PIXELS // 1_000_000} MP."
+        )
+    image = cv2.imdecode(np.frombuffer(memoryview(data), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Error al leer la imagen.")
+    return image
 
-    abs_dir = get_media_dir()
 
-    # Forzamos a JPG optimizado
-    ext = ".jpg"
-    filename = normalize_filename(full_name) + ext
-    abs_path = os.path.join(abs_dir, filename)
+def _write_atomic(abs_path: str, image: np.ndarray) -> None:
+    """Escribe el JPG completo en un temporal y lo renombra: nunca queda un archivo a medio escribir."""
+    ok, encoded = cv2.imencode(".jpg", image)
+    if not ok:
+        raise ValueError("No se pudo codificar la imagen.")
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(abs_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, abs_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
 
-    temp_path = abs_path + ".tmp"
-    data = await file.read()
-    with open(temp_path, "wb") as f:
-        f.write(data)
 
-    image = cv2.imread(temp_path)
-    if image is None:
-        os.remove(temp_path)
-        raise ValueError("Error al leer la imagen.")
+def store_face_photo(data: bytes, name: str, variant: int = 0) -> Tuple[str, np.ndarray]:
+    """
+    Decodifica la foto en memoria, guarda el recorte 150x150 del rostro más confiable y
+    devuelve (ruta relativa, recorte BGR). Síncrona: llamarla desde un hilo de trabajo.
+    variant > 0 guarda una foto adicional de la misma persona como `<nombre>.<variant>.jpg`.
+    ValueError si la imagen es demasiado grande, no se puede leer o no tiene rostros.
+    """
+    image = decode_photo(data)
 
     faces = detect_faces(image)
     if len(faces) == 0:
-        os.remove(temp_path)
         raise ValueError("No se detectó ningún rostro en la imagen.")
 
-    # Usamos la primera cara
-    (x, y, w, h) = faces[0]
-    face = image[y:y+h, x:x+w]
-    face = cv2.resize(face, (150, 150))
+    # Usamos la cara más confiable
+    (x, y, w, h, _) = faces[0]
+    face = cv2.resize(image[y:y+h, x:x+w], (150, 150))
+
+    # Forzamos a JPG optimizado
+    suffix = f".{variant}" if variant > 0 else ""
+    filename = normalize_filename(name) + suffix + ".jpg"
+    _write_atomic(os.path.join(get_media_dir(), filename), face)
+    return os.path.join("people_photos", filename).replace("\\", "/"), face
 
-    cv2.imwrite(abs_path, face)
-    os.remove(temp_path)
 
-    return os.path.join("people_photos", filename).replace("\\", "/")
+def _ingest_photo(data: bytes, name: str, variant: int) -> Tuple[str, Optional[np.ndarray]]:
+    rel_path, face = store_face_photo(data, name, variant)
+    # El embedding se calcula una única vez, acá, y se guarda con la persona
+    return rel_path, encode_face(face)
+
+
+async def save_person_photo(
+    file: UploadFile, full_name: str, variant: int = 0
+) -> Tuple[str, Optional[np.ndarray]]:
+    """
+    Guarda una foto de persona, procesa el rostro y devuelve la ruta relativa optimizada
+    junto con el embedding del rostro (None si no se pudo obtener).
+    variant > 0 guarda una foto adicional de la misma persona como `<nombre>.<variant>.jpg`.
+    """
+    if (file.content_type or "").lower() not in ALLOWED_CONTENT_TYPES:
+        raise ValueError("Invalid content type. Use PNG or JPEG.")
+
+    data = await file.read()
+    # Decodificar, detectar, guardar y codificar fuera del event loop
+    return await run_in_threadpool(_ingest_photo, data, full_name, variant)
+
 
 def delete_person_photo(rel_path: Optional[str]) -> None:
     if not rel_path:
@@ -82,3 +151,9 @@ def delete_person_photo(rel_path: Optional[str]) -> None:
     except Exception:
         # silent best-effort
         pass
+
+
+def photo_variant(rel_path: str) -> int:
+    """Número de foto adicional de una ruta (`<nombre>.<n>.jpg`); 0 para la principal."""
+    parts = os.path.basename(rel_path).split(".")
+    return int(parts[1]) if len(parts) == 3 and parts[1].isdigit() else 0
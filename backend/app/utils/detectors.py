@@ -0,0 +1,91 @@
+"""Detectores de rostros intercambiables.
+
+Todos reciben una imagen BGR y devuelven cajas (x, y, w, h) con un puntaje de
+confianza, en coordenadas de la imagen recibida:
+
+- HaarDetector: cascada de Haar sobre escala de grises (rápido, sólo caras
+  frontales y con buena luz). El puntaje es el peso de la última etapa de la
+  cascada, no una probabilidad.
+- DnnDetector: SSD ResNet-10 de OpenCV con cv2.dnn en CPU; detecta perfiles y
+  caras con poca luz a costa de más ms por cuadro. El puntaje es una
+  probabilidad entre 0 y 1. Los modelos se leen de archivos locales.
+
+Una instancia no es segura entre hilos (cv2.dnn.Net no lo es): cada cámara
+usa la suya. Se crean con el registro de modelos (ver models.ModelRegistry),
+que lee cada archivo de modelo una sola vez por proceso.
+"""
+
+from typing import List, NamedTuple, Union
+
+import cv2
+import numpy as np
+
+HAAR = "haar"
+DNN = "dnn"
+DETECTORS = (HAAR, DNN)
+
+
+class Detection(NamedTuple):
+    x: int
+    y: int
+    w: int
+    h: int
+    confidence: float
+
+
+class HaarDetector:
+    kind = HAAR
+
+    def __init__(self, cascade_path: str, scale_factor: float = 1.1, min_neighbors: int = 5) -> None:
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self._cascade = cv2.CascadeClassifier(cascade_path)
+
+    def detect(self, image: np.ndarray) -> List[Detection]:
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes, _, weights = self._cascade.detectMultiScale3(
+            gray, self.scale_factor, self.min_neighbors, outputRejectLevels=True
+        )
+        return [
+            Detection(int(x), int(y), int(w), int(h), float(weight))
+            for (x, y, w, h), weight in zip(boxes, np.ravel(weights))
+        ]
+
+
+class DnnDetector:
+    """SSD de caras de OpenCV (res10_300x300_ssd_iter_140000) sobre cv2.dnn."""
+
+    kind = DNN
+    # Entrada fija de la red y media BGR con la que fue entrenada
+    input_size = (300, 300)
+    mean = (104.0, 177.0, 123.0)
+
+    def __init__(self, config: np.ndarray, model: np.ndarray, min_confidence: float = 0.5) -> None:
+        """config y model: contenido del .prototxt y del .caffemodel (uint8), ya leídos en memoria."""
+        self.min_confidence = min_confidence
+        self._net = cv2.dnn.readNetFromCaffe(config, model)
+        self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def detect(self, image: np.ndarray) -> List[Detection]:
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1.0, self.input_size, self.mean, swapRB=False, crop=False)
+        self._net.setInput(blob)
+        # Salida (1, 1, N, 7): [_, clase, confianza, x1, y1, x2, y2] normalizados
+        output = self._net.forward()[0, 0]
+        output = output[output[:, 2] >= self.min_confidence]
+        detections = []
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        for confidence, box in zip(output[:, 2], output[:, 3:7] * scale):
+            x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+            x2, y2 = min(width, int(box[2])), min(height, int(box[3]))
+            if x2 - x1 <= 0 or y2 - y1 <= 0:
+                continue
+            detections.append(Detection(x1, y1, x2 - x1, y2 - y1, float(confidence)))
+        return detections
+
+
+FaceDetectorBackend = Union[HaarDetector, DnnDetector]
+
@@ -2,6 +2,7 @@ import os
 import cv2
 import cv2.data
 
+
 def resolve_haarcascade() -> str:
     """
     Devuelve la ruta del clasificador Haar 'haarcascade_frontalface_default.xml'.
@@ -48,10 +49,11 @@ def resolve_haarcascade() -> str:
 
 def detect_faces(image):
     """
-    Detecta rostros en una imagen usando Haarcascade.
-    Retorna lista de (x, y, w, h).
+    Detecta rostros en una imagen con el detector configurado (DETECTOR_BACKEND).
+    Retorna lista de Detection (x, y, w, h, confidence), la más confiable primero.
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    face_detector = cv2.CascadeClassifier(resolve_haarcascade())
-    faces = face_detector.detectMultiScale(gray, 1.1, 5)
-    return faces
+    from .models import models
+
+    # Instancia propia del hilo, reutilizada entre llamadas (ver models.ModelRegistry)
+    faces = models.detector().detect(image)
+    return sorted(faces, key=lambda face: face.confidence, reverse=True)
@@ -0,0 +1,135 @@
+"""Registro de modelos de detección y codificación, uno por proceso.
+
+Cada archivo de modelo se resuelve y se lee una sola vez por proceso (la
+búsqueda de la cascada de Haar recorre varias rutas candidatas y el DNN pesa
+~10 MB). Las instancias de OpenCV (CascadeClassifier, cv2.dnn.Net) no son
+seguras entre hilos: cada hilo recibe la suya, creada a partir de los recursos
+ya cargados. El codificador de dlib pesa más y se comparte, serializado con
+un lock (para codificar en paralelo están los workers de RecognitionPool).
+"""
+
+from threading import Lock, local
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .detectors import DNN, HAAR, DnnDetector, FaceDetectorBackend, HaarDetector
+from .face_utils import resolve_haarcascade
+from ..core.config import settings
+
+
+class FaceEncoder:
+    """Predictor de landmarks (5 puntos) y red de embeddings de dlib."""
+
+    def __init__(self, predictor_path: str, model_path: str) -> None:
+        import dlib
+
+        self._dlib = dlib
+        self._predictor = dlib.shape_predictor(predictor_path)
+        self._net = dlib.face_recognition_model_v1(model_path)
+        self._lock = Lock()
+
+    def encode(self, faces: Sequence[np.ndarray], num_jitters: int = 1) -> List[np.ndarray]:
+        """Embeddings de recortes RGB en los que el rostro ocupa toda la imagen, en una sola pasada."""
+        dlib = self._dlib
+        with self._lock:
+            shapes = []
+            for face in faces:
+                rect = dlib.rectangle(0, 0, face.shape[1], face.shape[0])
+                shapes.append(dlib.full_object_detections([self._predictor(face, rect)]))
+            descriptors = self._net.compute_face_descriptor(list(faces), shapes, num_jitters)
+        return [np.array(d[0]) for d in descriptors]
+
+    def encode_one(self, face: np.ndarray, num_jitters: int = 1) -> np.ndarray:
+        """Un solo recorte, con la API sin lotes (para versiones de dlib sin ella)."""
+        dlib = self._dlib
+        with self._lock:
+            shape = self._predictor(face, dlib.rectangle(0, 0, face.shape[1], face.shape[0]))
+            return np.array(self._net.compute_face_descriptor(face, shape, num_jitters))
+
+
+class ModelRegistry:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._resources: Dict[str, Any] = {}
+        self._local = local()
+        self.stats = {"loads": 0, "instances": 0}
+
+    def _resource(self, key: str, loader: Callable[[], Any]) -> Any:
+        value = self._resources.get(key)
+        if value is None:
+            with self._lock:
+                value = self._resources.get(key)
+                if value is None:
+                    value = loader()
+                    self._resources[key] = value
+                    self.stats["loads"] += 1
+        return value
+
+    # --- Recursos (una vez por proceso) ----------------------------------------
+
+    def haarcascade_path(self) -> str:
+        return self._resource("haar", resolve_haarcascade)
+
+    def dnn_model(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(prototxt, caffemodel) del detector DNN, leídos en memoria."""
+
+        def read() -> Tuple[np.ndarray, np.ndarray]:
+            buffers = []
+            for path in (settings.DETECTOR_DNN_CONFIG, settings.DETECTOR_DNN_MODEL):
+                try:
+                    with open(path, "rb") as f:
+                        buffers.append(np.frombuffer(f.read(), dtype=np.uint8))
+                except FileNotFoundError:
+                    raise FileNotFoundError(
+                        f"No se encontró el modelo del detector DNN: {path}. "
+                        "Ver DETECTOR_DNN_MODEL / DETECTOR_DNN_CONFIG en el README."
+                    ) from None
+            return buffers[0], buffers[1]
+
+        return self._resource("dnn", read)
+
+    def encoder(self) -> FaceEncoder:
+        """Codificador de dlib compartido por el proceso."""
+
+        def load() -> FaceEncoder:
+            import face_recognition_models
+
+            return FaceEncoder(
+                face_recognition_models.pose_predictor_five_point_model_location(),
+                face_recognition_models.face_recognition_model_location(),
+            )
+
+        return self._resource("encoder", load)
+
+    # --- Detectores ------------------------------------------------------------
+
+    def new_detector(self, kind: Optional[str] = None, scale_factor: float = 1.1) -> FaceDetectorBackend:
+        """Instancia nueva, para quien la usa siempre desde un mismo hilo (p. ej. una cámara).
+        kind: "haar" o "dnn" (por defecto DETECTOR_BACKEND); ValueError si no existe.
+        scale_factor sólo aplica a Haar."""
+        kind = (kind or settings.DETECTOR_BACKEND).lower()
+        if kind == HAAR:
+            detector: FaceDetectorBackend = HaarDetector(self.haarcascade_path(), scale_factor=scale_factor)
+        elif kind == DNN:
+            config, model = self.dnn_model()
+            detector = DnnDetector(config, model, min_confidence=settings.DETECTOR_MIN_CONFIDENCE)
+        else:
+            raise ValueError(f"Detector desconocido: '{kind}' (opciones: {HAAR}, {DNN})")
+        with self._lock:
+            self.stats["instances"] += 1
+        return detector
+
+    def detector(self, kind: Optional[str] = None, scale_factor: float = 1.1) -> FaceDetectorBackend:
+        """Instancia propia del hilo que llama, reutilizada entre llamadas."""
+        cache = getattr(self._local, "detectors", None)
+        if cache is None:
+            cache = self._local.detectors = {}
+        key = ((kind or settings.DETECTOR_BACKEND).lower(), scale_factor)
+        detector = cache.get(key)
+        if detector is None:
+            detector = cache[key] = self.new_detector(*key)
+        return detector
+
+
+models = ModelRegistry()
@@ -0,0 +1,154 @@
+"""Utilidades compartidas por los benchmarks (sólo CPU, sin cámara)."""
+
+import os
+
+# Forzar CPU antes de importar dlib (también en los procesos del pool, que heredan el entorno)
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from app.modules.attendances.gallery import EMBEDDING_DIM
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class StageTimer:
+    """Acumula duraciones (ms) por etapa."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.samples.setdefault(stage, []).append(seconds * 1000.0)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: percentiles(values) for stage, values in self.samples.items()}
+
+
+def percentiles(values_ms: Sequence[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {"count": 0}
+    values = np.asarray(values_ms, dtype=np.float64)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def peak_rss_mb() -> Optional[Dict[str, float]]:
+    """Memoria residente máxima del proceso y de sus hijos (workers); None en Windows."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"self": round(own / unit, 1), "children": round(children / unit, 1)}
+
+
+def synthetic_gallery(size: int, seed: int = 0):
+    """Embeddings aleatorios con la escala típica de dlib (norma ~1)."""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 1.0 / np.sqrt(EMBEDDING_DIM), (size, EMBEDDING_DIM)).astype(np.float32)
+    names = [f"synthetic-{i:06d}" for i in range(size)]
+    return encodings, names
+
+
+def clustered_gallery(size: int, clusters: int = 256, spread: float = 0.5, seed: int = 0):
+    """Embeddings agrupados alrededor de `clusters` centros, más parecido a caras
+    reales que el ruido uniforme (que no tiene estructura que un índice aproveche)."""
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(EMBEDDING_DIM)
+    centers = rng.normal(0.0, scale, (clusters, EMBEDDING_DIM))
+    encodings = centers[rng.integers(0, clusters, size)] + rng.normal(0.0, spread * scale, (size, EMBEDDING_DIM))
+    names = [f"synthetic-{i:06d}" for i in range(size)]
+    return encodings.astype(np.float32), names
+
+
+def load_frames(images: Optional[str] = None, clip: Optional[str] = None, every_seconds: float = 0.0, limit: int = 0):
+    """Cuadros fijos de entrada: imágenes de una carpeta o cuadros de un clip."""
+    frames = []
+    if images:
+        for name in sorted(os.listdir(images)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            frame = cv2.imread(os.path.join(images, name))
+            if frame is not None:
+                frames.append(frame)
+            if limit and len(frames) >= limit:
+                break
+    if clip:
+        from app.modules.attendances.sources import FileSource
+
+        for decoded in FileSource(clip, every_seconds=every_seconds):
+            frames.append(decoded.frame)
+            if limit and len(frames) >= limit:
+                break
+    return frames
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "app_version": os.getenv("APP_VERSION", "0.1.0"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def write_json(data: Dict[str, Any], path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"Resultados guardados en '{path}'")
+
+
+def compare(current: Dict[str, Any], baseline_path: str, keys: Iterable[str] = ("p50", "p90")) -> None:
+    """Imprime la variación de latencia por etapa respecto de un resultado anterior."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {r["gallery_size"]: r for r in baseline.get("results", [])}
+    for result in current["results"]:
+        old = previous.get(result["gallery_size"])
+        if old is None:
+            continue
+        for stage, stats in result["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if not old_stats:
+                continue
+            deltas = []
+            for key in keys:
+                if old_stats.get(key):
+                    deltas.append(f"{key} {100.0 * (stats[key] - old_stats[key]) / old_stats[key]:+.1f}%")
+            print(f"  N={result['gallery_size']:>6} {stage:<8} " + ", ".join(deltas))
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
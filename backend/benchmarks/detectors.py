@@ -0,0 +1,173 @@
+"""Benchmark de los detectores de rostros (Haar y DNN) a 640x480.
+
+Cada imagen se lleva a 640x480 y pasa por la misma reducción que usa
+FaceDetector antes de detectar. Con `--labels` (JSON {archivo: [[x, y, w, h], ...]}
+en coordenadas de la imagen original) se calcula precisión y recall con
+IoU >= 0.5; sin etiquetas se informa la fracción de imágenes con al menos una
+cara, que con las fotos de alta (una cara por foto) aproxima el recall. Desde `backend/`:
+
+    python -m benchmarks.detectors --images muestras/ --labels muestras/caras.json --out benchmarks/results/detectors.json
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+
+from benchmarks.common import IMAGE_EXTENSIONS, environment, peak_rss_mb, percentiles, write_json
+from app.modules.attendances.face_detector import FaceDetector
+from app.modules.people.storage import get_media_dir as get_people_media_dir
+from app.utils.detectors import DETECTORS
+from app.utils.models import models
+
+Box = Tuple[float, float, float, float]
+
+
+def load_images(folder: str, size: Tuple[int, int], limit: int = 0):
+    """(nombre, imagen redimensionada, factores de escala x/y) de cada imagen de la carpeta."""
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(os.path.join(folder, name))
+        if image is None:
+            continue
+        height, width = image.shape[:2]
+        images.append((name, cv2.resize(image, size), (size[0] / width, size[1] / height)))
+        if limit and len(images) >= limit:
+            break
+    return images
+
+
+def iou(a: Box, b: Box) -> float:
+    ax2, ay2, bx2, by2 = a[0] + a[2], a[1] + a[3], b[0] + b[2], b[1] + b[3]
+    w = max(0.0, min(ax2, bx2) - max(a[0], b[0]))
+    h = max(0.0, min(ay2, by2) - max(a[1], b[1]))
+    inter = w * h
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_boxes(detections, truth: Sequence[Box], threshold: float) -> int:
+    """Verdaderos positivos: cada caja etiquetada se empareja con a lo sumo una
+    detección, recorriendo las detecciones de mayor a menor confianza."""
+    free = list(truth)
+    hits = 0
+    for detection in sorted(detections, key=lambda d: d.confidence, reverse=True):
+        scores = [iou(detection[:4], box) for box in free]
+        if scores and max(scores) >= threshold:
+            free.pop(scores.index(max(scores)))
+            hits += 1
+    return hits
+
+
+def measure(kind: str, images, labels: Optional[Dict[str, List[Box]]], args) -> Dict[str, Any]:
+    detector = models.new_detector(kind, scale_factor=FaceDetector.haar_scale_factor)
+    inv_scale = 1.0 / args.scale
+    samples = []
+    detected = with_face = true_positives = labeled = 0
+    confidences = []
+    for iteration in range(args.repeat):
+        for name, image, (fx, fy) in images:
+            start = time.perf_counter()
+            small = cv2.resize(image, (0, 0), fx=args.scale, fy=args.scale)
+            found = detector.detect(small)
+            samples.append((time.perf_counter() - start) * 1000.0)
+            if iteration > 0:
+                continue
+            found = [
+                type(d)(d.x * inv_scale, d.y * inv_scale, d.w * inv_scale, d.h * inv_scale, d.confidence)
+                for d in found
+            ]
+            detected += len(found)
+            with_face += 1 if found else 0
+            confidences.extend(d.confidence for d in found)
+            if labels is not None and name in labels:
+                truth = [(x * fx, y * fy, w * fx, h * fy) for x, y, w, h in labels[name]]
+                labeled += len(truth)
+                true_positives += match_boxes(found, truth, args.iou)
+
+    result = {
+        "detector": kind,
+        "ms_per_frame": percentiles(samples),
+        "fps": round(1000.0 / percentiles(samples)["mean"], 1) if samples else None,
+        "faces_detected": detected,
+        "images_with_face": round(with_face / len(images), 3),
+        "confidence": percentiles(confidences),
+    }
+    if labels is not None:
+        result["precision"] = round(true_positives / detected, 3) if detected else None
+        result["recall"] = round(true_positives / labeled, 3) if labeled else None
+    return result
+
+
+def run(args) -> Dict[str, Any]:
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    images = load_images(args.images, size, args.limit)
+    if not images:
+        raise SystemExit(f"No hay imágenes en '{args.images}'")
+    labels = None
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+    print(f"{len(images)} imágenes a {size[0]}x{size[1]}, detección a escala {args.scale}")
+
+    results = []
+    for kind in args.detectors:
+        try:
+            result = measure(kind, images, labels, args)
+        except FileNotFoundError as e:
+            print(f"{kind}: omitido ({e})")
+            continue
+        results.append(result)
+        accuracy = (
+            f"precisión={result['precision']} recall={result['recall']}"
+            if labels is not None
+            else f"con cara={result['images_with_face']}"
+        )
+        print(
+            f"{kind:<5} p50={result['ms_per_frame']['p50']}ms p90={result['ms_per_frame']['p90']}ms"
+            f"  {result['fps']} fps  {accuracy}"
+        )
+    return {
+        "benchmark": "detectors",
+        "environment": environment(),
+        "params": {
+            "images": args.images,
+            "labels": args.labels,
+            "input_images": len(images),
+            "size": args.size,
+            "scale": args.scale,
+            "iou": args.iou,
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de precisión y latencia de los detectores de rostros.")
+    parser.add_argument("--images", help="Carpeta con imágenes de entrada (por defecto, las fotos de personas)")
+    parser.add_argument("--labels", help="JSON {archivo: [[x, y, w, h], ...]} con las caras de cada imagen")
+    parser.add_argument("--detectors", type=lambda v: [d.strip() for d in v.split(",") if d.strip()], default=list(DETECTORS), help="Detectores a medir, separados por coma")
+    parser.add_argument("--size", default="640x480", help="Tamaño al que se lleva cada imagen (ANCHOxALTO)")
+    parser.add_argument("--scale", type=float, default=FaceDetector.scale, help="Reducción previa a la detección (como en vivo)")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU mínimo para contar una detección como correcta")
+    parser.add_argument("--limit", type=int, default=500, help="Máximo de imágenes (0 = todas)")
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas sobre las imágenes")
+    parser.add_argument("--out", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+    if not args.images:
+        args.images = get_people_media_dir()
+
+    data = run(args)
+    if args.out:
+        write_json(data, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark de la codificación por lotes: costo por cara según cuántas caras tiene un cuadro.
+
+Para cada tamaño de lote compara codificar las caras de a una (como antes,
+una llamada a face_recognition por recorte) contra encode_batch, que pasa
+todos los recortes juntos por la red de dlib, y opcionalmente contra
+RecognitionPool con workers. Desde `backend/`:
+
+    python -m benchmarks.encoding --images muestras/ --batches 1,2,4,8,16,32 --out benchmarks/results/encoding.json
+    python -m benchmarks.encoding --workers 3
+"""
+
+import argparse
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.common import environment, load_frames, parse_sizes, peak_rss_mb, percentiles, timed, write_json
+from app.modules.attendances.recognition import (
+    SLOT_SHAPE,
+    RecognitionPool,
+    encode_batch,
+    encode_prepared,
+    prepare_face,
+    prepare_face_into,
+)
+from app.modules.people.storage import get_media_dir as get_people_media_dir
+from app.utils.models import models
+
+
+def face_crops(frames, limit: int) -> List[np.ndarray]:
+    """Recortes de las caras detectadas; si no hay ninguna, el centro de cada imagen."""
+    detector = models.new_detector("haar")
+    crops = []
+    for frame in frames:
+        for x, y, w, h, _ in detector.detect(frame):
+            crops.append(frame[y : y + h, x : x + w])
+    if not crops:
+        print("No se detectaron caras: se usa el centro de cada imagen")
+        for frame in frames:
+            height, width = frame.shape[:2]
+            side = min(height, width) // 2
+            crops.append(frame[(height - side) // 2 : (height + side) // 2, (width - side) // 2 : (width + side) // 2])
+    return crops[:limit] if limit else crops
+
+
+def per_face(samples_ms: List[float], batch: int) -> Dict[str, float]:
+    return percentiles([sample / batch for sample in samples_ms])
+
+
+def run(args) -> Dict[str, Any]:
+    frames = load_frames(args.images, args.clip, args.every, args.limit)
+    crops = face_crops(frames, args.limit)
+    if not crops:
+        raise SystemExit("No hay cuadros de entrada: usar --images o --clip")
+    print(f"{len(crops)} recortes de cara")
+
+    pool = RecognitionPool(args.workers) if args.workers > 0 else None
+    buffer = np.empty((max(args.batches), *SLOT_SHAPE), dtype=np.uint8)
+    results = []
+    try:
+        # Calentar modelos (y procesos) fuera de la medición
+        encode_prepared(prepare_face(crops[0]))
+        if pool is not None:
+            pool.encode(crops[:1])
+        for batch in args.batches:
+            rois = [crops[i % len(crops)] for i in range(batch)]
+            sequential, batched, pooled = [], [], []
+            for _ in range(args.repeat):
+                _, elapsed = timed(lambda: [encode_prepared(prepare_face(roi)) for roi in rois])
+                sequential.append(elapsed * 1000.0)
+
+                def batch_encode():
+                    for i, roi in enumerate(rois):
+                        prepare_face_into(roi, buffer[i])
+                    return encode_batch(buffer[:batch])
+
+                _, elapsed = timed(batch_encode)
+                batched.append(elapsed * 1000.0)
+                if pool is not None:
+                    _, elapsed = timed(pool.encode, rois)
+                    pooled.append(elapsed * 1000.0)
+            result = {
+                "faces_per_frame": batch,
+                "per_face_ms": {"sequential": per_face(sequential, batch), "batched": per_face(batched, batch)},
+            }
+            if pool is not None:
+                result["per_face_ms"]["pool"] = per_face(pooled, batch)
+            results.append(result)
+            line = (
+                f"{batch:>3} caras  de a una p50={result['per_face_ms']['sequential']['p50']}ms/cara"
+                f"  lote p50={result['per_face_ms']['batched']['p50']}ms/cara"
+            )
+            if pool is not None:
+                line += f"  pool({args.workers}) p50={result['per_face_ms']['pool']['p50']}ms/cara"
+            print(line)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return {
+        "benchmark": "encoding",
+        "environment": environment(),
+        "params": {
+            "images": args.images,
+            "clip": args.clip,
+            "crops": len(crops),
+            "repeat": args.repeat,
+            "workers": args.workers,
+        },
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de codificación por lotes.")
+    parser.add_argument("--images", help="Carpeta con imágenes de entrada (por defecto, las fotos de personas)")
+    parser.add_argument("--clip", help="Video de entrada")
+    parser.add_argument("--every", type=float, default=0.0, help="Con --clip, un cuadro cada N segundos")
+    parser.add_argument("--limit", type=int, default=64, help="Máximo de cuadros y de recortes (0 = todos)")
+    parser.add_argument("--batches", type=parse_sizes, default=[1, 2, 4, 8, 16, 32], help="Caras por cuadro, separadas por coma")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por tamaño de lote")
+    parser.add_argument("--workers", type=int, default=0, help="Medir también RecognitionPool con N procesos")
+    parser.add_argument("--out", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+    if not args.images and not args.clip:
+        args.images = get_people_media_dir()
+
+    data = run(args)
+    if args.out:
+        write_json(data, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark del alta de fotos: fotos por segundo con y sin el registro de modelos.
+
+Cada foto pasa por lo mismo que al darla de alta (decodificar, detectar la
+cara más confiable, recortar y calcular el embedding), desde varios hilos
+como el threadpool de FastAPI. Se compara crear el detector en cada llamada
+(resolver la cascada o leer el DNN de disco cada vez) contra las instancias
+por hilo de models.ModelRegistry. Desde `backend/`:
+
+    python -m benchmarks.enrollment --images muestras/ --threads 1,4,8 --out benchmarks/results/enrollment.json
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.common import IMAGE_EXTENSIONS, environment, parse_sizes, peak_rss_mb, percentiles, write_json
+from app.core.config import settings
+from app.modules.attendances.recognition import encode_face
+from app.modules.people.storage import get_media_dir as get_people_media_dir
+from app.utils.detectors import DETECTORS, DNN, DnnDetector, HaarDetector
+from app.utils.face_utils import resolve_haarcascade
+from app.utils.models import models
+
+
+def load_photos(folder: str, limit: int) -> List[bytes]:
+    """Contenido (sin decodificar) de las fotos de la carpeta, como llega en un upload."""
+    photos = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        with open(os.path.join(folder, name), "rb") as f:
+            photos.append(f.read())
+        if limit and len(photos) >= limit:
+            break
+    return photos
+
+
+def per_call_detector(kind: str):
+    """Como antes del registro: cada llamada resuelve y carga el modelo desde disco."""
+    if kind == DNN:
+        with open(settings.DETECTOR_DNN_CONFIG, "rb") as f:
+            config = np.frombuffer(f.read(), dtype=np.uint8)
+        with open(settings.DETECTOR_DNN_MODEL, "rb") as f:
+            model = np.frombuffer(f.read(), dtype=np.uint8)
+        return DnnDetector(config, model, min_confidence=settings.DETECTOR_MIN_CONFIDENCE)
+    return HaarDetector(resolve_haarcascade())
+
+
+def enroll(data: bytes, get_detector: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is not None:
+        faces = sorted(get_detector().detect(image), key=lambda face: face.confidence, reverse=True)
+        if faces:
+            x, y, w, h, _ = faces[0]
+            encode_face(image[y : y + h, x : x + w])
+    return (time.perf_counter() - start) * 1000.0
+
+
+def measure(photos: List[bytes], threads: int, get_detector: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    samples: List[float] = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in range(repeat):
+            samples.extend(executor.map(lambda data: enroll(data, get_detector), photos))
+    elapsed = time.perf_counter() - start
+    return {
+        "photos_per_second": round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+        "ms_per_photo": percentiles(samples),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    photos = load_photos(args.images, args.limit)
+    if not photos:
+        raise SystemExit(f"No hay imágenes en '{args.images}'")
+    print(f"{len(photos)} fotos, detector {args.detector}")
+
+    # Calentar el codificador de dlib (compartido en ambos modos) fuera de la medición
+    encode_face(np.zeros((150, 150, 3), dtype=np.uint8))
+    results = []
+    for threads in args.threads:
+        per_call = measure(photos, threads, lambda: per_call_detector(args.detector), args.repeat)
+        registry = measure(photos, threads, lambda: models.detector(args.detector), args.repeat)
+        results.append({"threads": threads, "per_call": per_call, "registry": registry})
+        print(
+            f"{threads:>3} hilos  por llamada {per_call['photos_per_second']} fotos/s"
+            f" (p50={per_call['ms_per_photo']['p50']}ms)"
+            f"  registro {registry['photos_per_second']} fotos/s (p50={registry['ms_per_photo']['p50']}ms)"
+        )
+    return {
+        "benchmark": "enrollment",
+        "environment": environment(),
+        "params": {
+            "images": args.images,
+            "photos": len(photos),
+            "detector": args.detector,
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "models": dict(models.stats),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de fotos por segundo al dar de alta.")
+    parser.add_argument("--images", help="Carpeta con fotos de entrada (por defecto, las fotos de personas)")
+    parser.add_argument("--detector", choices=DETECTORS, default=settings.DETECTOR_BACKEND, help="Detector de rostros")
+    parser.add_argument("--threads", type=parse_sizes, default=[1, 4], help="Hilos concurrentes, separados por coma")
+    parser.add_argument("--limit", type=int, default=200, help="Máximo de fotos (0 = todas)")
+    parser.add_argument("--repeat", type=int, default=2, help="Pasadas sobre las fotos")
+    parser.add_argument("--out", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+    if not args.images:
+        args.images = get_people_media_dir()
+
+    data = run(args)
+    if args.out:
+        write_json(data, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark de recall y latencia del índice aproximado (IVF) contra la búsqueda exacta.
+
+Las consultas son embeddings de la galería con ruido (otra foto de la misma
+persona); el recall@1 es la fracción de consultas en las que IVF devuelve el
+mismo vecino que la búsqueda exacta. Desde `backend/`:
+
+    python -m benchmarks.index --sizes 10000,100000 --nprobe 1,4,8,16 --out benchmarks/results/index.json
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.common import (
+    clustered_gallery,
+    compare,
+    environment,
+    parse_sizes,
+    peak_rss_mb,
+    percentiles,
+    write_json,
+)
+from app.modules.attendances.face_index import FlatIndex, IVFIndex
+
+
+def measure(index, queries: np.ndarray, batch: int) -> Dict[str, Any]:
+    """Latencia por lote de consultas (un lote = las caras de un cuadro) y vecinos encontrados."""
+    samples = []
+    found = []
+    for start in range(0, queries.shape[0], batch):
+        block = queries[start : start + batch]
+        t0 = time.perf_counter()
+        _, ids = index.search(block, k=2)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+        found.append(ids[:, 0])
+    return {"latency": percentiles(samples), "ids": np.concatenate(found)}
+
+
+def run(args) -> Dict[str, Any]:
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for size in args.sizes:
+        vectors, _ = clustered_gallery(size, seed=args.seed)
+        ids = np.arange(size, dtype=np.int64)
+        picks = rng.integers(0, size, args.queries)
+        noise = rng.normal(0.0, args.noise / np.sqrt(vectors.shape[1]), (args.queries, vectors.shape[1]))
+        queries = (vectors[picks] + noise).astype(np.float32)
+
+        flat = FlatIndex()
+        flat.reset(ids, vectors)
+        exact = measure(flat, queries, args.batch)
+        result = {
+            "gallery_size": size,
+            "queries": args.queries,
+            "stages": {"flat": exact["latency"]},
+            "recall_at_1": {},
+            "build_seconds": {},
+        }
+        print(f"N={size:>7}  flat p50={exact['latency']['p50']}ms")
+
+        for nprobe in args.nprobe:
+            ivf = IVFIndex(nlist=args.nlist, nprobe=nprobe, seed=args.seed)
+            t0 = time.perf_counter()
+            ivf.reset(ids, vectors)
+            build = time.perf_counter() - t0
+            approx = measure(ivf, queries, args.batch)
+            recall = float(np.mean(approx["ids"] == exact["ids"]))
+            key = f"ivf_nprobe{nprobe}"
+            result["stages"][key] = approx["latency"]
+            result["recall_at_1"][key] = round(recall, 4)
+            result["build_seconds"][key] = round(build, 3)
+            print(
+                f"N={size:>7}  {key:<14} p50={approx['latency']['p50']}ms  "
+                f"recall@1={recall:.3f}  build={build:.2f}s"
+            )
+        result["peak_rss_mb"] = peak_rss_mb()
+        results.append(result)
+    return {
+        "benchmark": "index",
+        "environment": environment(),
+        "params": {
+            "queries": args.queries,
+            "batch": args.batch,
+            "noise": args.noise,
+            "nlist": args.nlist,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recall y latencia de IVF contra la búsqueda exacta.")
+    parser.add_argument("--sizes", type=parse_sizes, default=[10000, 100000], help="Tamaños de galería, separados por coma")
+    parser.add_argument("--nprobe", type=parse_sizes, default=[1, 4, 8, 16], help="Valores de nprobe a probar")
+    parser.add_argument("--nlist", type=int, default=0, help="Listas del IVF (0 = ~sqrt(N))")
+    parser.add_argument("--queries", type=int, default=1000, help="Cantidad de consultas")
+    parser.add_argument("--batch", type=int, default=4, help="Consultas por búsqueda (caras por cuadro)")
+    parser.add_argument("--noise", type=float, default=0.2, help="Ruido de las consultas respecto del embedding original")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para ver la variación")
+    args = parser.parse_args(argv)
+
+    data = run(args)
+    if args.out:
+        write_json(data, args.out)
+    if args.compare:
+        print(f"Variación respecto de '{args.compare}':")
+        compare(data, args.compare)
+
+
+if __name__ == "__main__":
+    main()
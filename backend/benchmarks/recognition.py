@@ -0,0 +1,155 @@
+"""Benchmark del camino caliente: detección -> codificación -> emparejamiento.
+
+Corre sobre imágenes o un clip fijos (sin cámara, sólo CPU) con galerías
+sintéticas de distintos tamaños y guarda percentiles por etapa, fps y RSS
+máximo en JSON para comparar entre versiones. Desde `backend/`:
+
+    python -m benchmarks.recognition --images muestras/ --sizes 100,1000,10000,50000 --out results/recognition.json
+    python -m benchmarks.recognition --clip clase.mp4 --every 0.5 --compare results/recognition.json
+
+La detección y la codificación no dependen del tamaño de la galería: se miden
+una vez y sus embeddings se reutilizan para medir el emparejamiento contra
+cada galería. Los fps por tamaño salen de la suma de las tres etapas.
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.common import (
+    StageTimer,
+    compare,
+    environment,
+    load_frames,
+    parse_sizes,
+    peak_rss_mb,
+    percentiles,
+    synthetic_gallery,
+    timed,
+    write_json,
+)
+from app.modules.attendances.face_detector import FaceDetector
+from app.modules.attendances.gallery import FaceGallery
+from app.modules.attendances.recognition import RecognitionPool
+from app.modules.people.storage import get_media_dir as get_people_media_dir
+
+
+def measure_detection(detector: FaceDetector, recognizer: RecognitionPool, frames, repeat: int):
+    """Tiempos de detección y codificación por cuadro, y los embeddings obtenidos."""
+    timer = StageTimer()
+    frame_encodings: List[List[np.ndarray]] = []
+    faces = 0
+    for iteration in range(repeat):
+        for frame in frames:
+            start = time.perf_counter()
+            frame = cv2.flip(frame, 1)
+            _, rois = detector.detect_boxes(frame)
+            timer.add("detect", time.perf_counter() - start)
+            encodings, elapsed = timed(recognizer.encode, rois)
+            timer.add("encode", elapsed)
+            if iteration == 0:
+                valid = [e for e in encodings if e is not None]
+                faces += len(valid)
+                frame_encodings.append(valid)
+    return timer, frame_encodings, faces
+
+
+def measure_matching(gallery: FaceGallery, frame_encodings, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        for encodings in frame_encodings:
+            _, elapsed = timed(gallery.match, encodings)
+            samples.append(elapsed * 1000.0)
+    return samples
+
+
+def run(args) -> Dict[str, Any]:
+    frames = load_frames(args.images, args.clip, args.every, args.limit)
+    if not frames:
+        raise SystemExit("No hay cuadros de entrada: usar --images o --clip")
+    print(f"{len(frames)} cuadros de entrada, {args.workers} workers de reconocimiento")
+
+    recognizer = RecognitionPool(args.workers)
+    try:
+        detector = FaceDetector("benchmark", None, FaceGallery(), recognizer, headless=True, harvest=False)
+        # Calentar el pool (arranque de procesos y carga de modelos) fuera de la medición
+        recognizer.encode([frames[0]])
+        timer, frame_encodings, faces = measure_detection(detector, recognizer, frames, args.repeat)
+    finally:
+        recognizer.shutdown()
+
+    if faces == 0:
+        # Sin caras detectadas igual se mide el emparejamiento, con consultas sintéticas
+        print("No se detectaron caras: el emparejamiento se mide con embeddings sintéticos")
+        queries, _ = synthetic_gallery(len(frames), seed=1)
+        frame_encodings = [[q] for q in queries]
+
+    stages = timer.summary()
+    detect_encode_ms = sum(timer.samples["detect"]) + sum(timer.samples["encode"])
+    results = []
+    for size in args.sizes:
+        encodings, names = synthetic_gallery(size)
+        gallery = FaceGallery()
+        gallery.load(encodings, names)
+        match_ms = measure_matching(gallery, frame_encodings, args.repeat)
+        total_ms = detect_encode_ms + sum(match_ms)
+        processed = len(frames) * args.repeat
+        result = {
+            "gallery_size": size,
+            "frames": processed,
+            "faces_per_pass": faces,
+            "fps": round(processed / (total_ms / 1000.0), 2) if total_ms > 0 else None,
+            "stages": {**stages, "match": percentiles(match_ms)},
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        results.append(result)
+        print(
+            f"N={size:>6}  fps={result['fps']}  match p50={result['stages']['match']['p50']}ms"
+            f"  p99={result['stages']['match']['p99']}ms"
+        )
+    print(
+        f"detect p50={stages['detect']['p50']}ms  encode p50={stages['encode']['p50']}ms"
+    )
+    return {
+        "benchmark": "recognition",
+        "environment": environment(),
+        "params": {
+            "images": args.images,
+            "clip": args.clip,
+            "every": args.every,
+            "input_frames": len(frames),
+            "repeat": args.repeat,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de detección, codificación y emparejamiento.")
+    parser.add_argument("--images", help="Carpeta con imágenes de entrada (por defecto, las fotos de personas)")
+    parser.add_argument("--clip", help="Video de entrada")
+    parser.add_argument("--every", type=float, default=0.0, help="Con --clip, un cuadro cada N segundos")
+    parser.add_argument("--limit", type=int, default=200, help="Máximo de cuadros de entrada (0 = todos)")
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000, 10000, 50000], help="Tamaños de galería, separados por coma")
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas sobre los cuadros")
+    parser.add_argument("--workers", type=int, default=0, help="Procesos de reconocimiento (0 = en el hilo)")
+    parser.add_argument("--out", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para ver la variación")
+    args = parser.parse_args(argv)
+    if not args.images and not args.clip:
+        args.images = get_people_media_dir()
+
+    data = run(args)
+    if args.out:
+        write_json(data, args.out)
+    if args.compare:
+        print(f"Variación respecto de '{args.compare}':")
+        compare(data, args.compare)
+
+
+if __name__ == "__main__":
+    main()